@@ -0,0 +1,120 @@
+import argparse
+import random
+import copy
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.catalog import CosmeticCatalog, CosmeticStore
+
+# python benchmarks/catalog_refresh.py --items 50000
+
+TYPES = ('outfit', 'emote', 'backpack', 'pickaxe', 'wrap', 'glider', 'contrail', 'loadingscreen', 'spray')
+RARITIES = ('common', 'uncommon', 'rare', 'epic', 'legendary')
+WORDS = ('renegade', 'raider', 'black', 'knight', 'floss', 'merry', 'mint', 'storm', 'shadow', 'neon', 'tsuki', 'midas')
+
+def cosmetic(i: int, rnd: random.Random):
+
+    cosmetic_type = rnd.choice(TYPES)
+    rarity = rnd.choice(RARITIES)
+    chapter, season = rnd.randint(1, 5), rnd.randint(1, 10)
+
+    return {
+        'id': f'{cosmetic_type.upper()}_{i:06d}_Synthetic',
+        'name': f'{rnd.choice(WORDS).capitalize()} {rnd.choice(WORDS).capitalize()} {i}',
+        'description': 'Synthetic cosmetic.',
+        'type': {'value': cosmetic_type, 'displayValue': cosmetic_type.capitalize(), 'backendValue': f'Athena{cosmetic_type.capitalize()}'},
+        'rarity': {'value': rarity, 'displayValue': rarity.capitalize(), 'backendValue': f'EFortRarity::{rarity.capitalize()}'},
+        'series': None,
+        'set': {'value': f'Set {i % 300}', 'text': f'Part of the Set {i % 300} set.', 'backendValue': f'Set{i % 300}'},
+        'introduction': {'chapter': str(chapter), 'season': str(season), 'text': f'Introduced in Chapter {chapter}, Season {season}.', 'backendValue': chapter * 10 + season},
+        'images': {'smallIcon': f'https://example.invalid/{i}/smallicon.png', 'icon': f'https://example.invalid/{i}/icon.png', 'featured': None, 'other': None},
+        'variants': None,
+        'searchTags': None,
+        'gameplayTags': [f'Cosmetics.Source.Synthetic{i % 7}'],
+        'path': f'Athena/Items/Cosmetics/{i}',
+        'added': '2023-01-10T00:00:00Z'
+    }
+
+def modified(cosmetic: dict, rnd: random.Random):
+
+    # same id, what a season update usually touches
+    cosmetic = copy.deepcopy(cosmetic)
+    cosmetic['name'] = f'{cosmetic["name"]} {rnd.choice(WORDS).capitalize()}'
+    cosmetic['rarity']['value'] = rnd.choice(RARITIES)
+
+    return cosmetic
+
+def legacy_refresh(lists: dict, cosmetics: list):
+
+    # what _load_cosmetics did before the catalog, membership tests scan whole lists of dicts
+    for cosmetic in cosmetics:
+
+        if cosmetic not in lists['all']:
+            lists['all'].append(cosmetic)
+
+        typed = lists.setdefault(cosmetic['type']['value'], [])
+
+        if cosmetic not in typed:
+            typed.append(cosmetic)
+
+def timed(function, *args):
+
+    start = time.perf_counter()
+    result = function(*args)
+
+    return time.perf_counter() - start, result
+
+def main():
+
+    parser = argparse.ArgumentParser(description = 'Times a cosmetic catalog refresh on a synthetic payload.')
+    parser.add_argument('--items', type = int, default = 50000)
+    parser.add_argument('--changed', type = int, default = 500, help = 'cosmetics modified by the update')
+    parser.add_argument('--added', type = int, default = 100, help = 'cosmetics added by the update')
+    parser.add_argument('--legacy', type = int, default = 5000, help = 'payload size for the old list based refresh, 0 skips it')
+    parser.add_argument('--seed', type = int, default = 1)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+
+    payload = [cosmetic(i, rnd) for i in range(args.items)]
+
+    update = copy.deepcopy(payload)
+
+    for i in rnd.sample(range(args.items), args.changed):
+        update[i] = modified(update[i], rnd)
+
+    update += [cosmetic(args.items + i, rnd) for i in range(args.added)]
+
+    store = CosmeticStore()
+
+    seconds, catalog = timed(lambda: CosmeticCatalog('en', payload, store = store))
+    store.attach(catalog)
+
+    print(f'{args.items} cosmetics, update changes {args.changed} and adds {args.added}')
+    print(f'build                 {seconds * 1000:8.0f} ms')
+
+    seconds, (_, delta) = timed(catalog.refresh, copy.deepcopy(payload))
+    print(f'refresh, no changes   {seconds * 1000:8.0f} ms  {sum(len(ids) for ids in delta.values())} changes')
+
+    seconds, (_, delta) = timed(catalog.refresh, update)
+    print(f'refresh, update       {seconds * 1000:8.0f} ms  {len(delta["changed"])} changed, {len(delta["added"])} added')
+
+    seconds, _ = timed(lambda: CosmeticCatalog('en', update, store = store))
+    print(f'full rebuild, update  {seconds * 1000:8.0f} ms')
+
+    if args.legacy != 0:
+
+        sample = payload[:args.legacy]
+        lists = {'all': []}
+
+        legacy_refresh(lists, sample) # the lists are full between polls, time the steady state
+
+        seconds, _ = timed(legacy_refresh, lists, copy.deepcopy(sample))
+        print(f'old list refresh      {seconds * 1000:8.0f} ms  on {args.legacy} cosmetics')
+        print(f'old list refresh      {seconds * (args.items / args.legacy) ** 2 * 1000:8.0f} ms  estimated for {args.items}, it grows with the square of the size')
+
+if __name__ == '__main__':
+    main()
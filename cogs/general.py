@@ -8,7 +8,7 @@ import json
 import cgi
 import io
 
-from modules import util
+from modules import util, views
 
 log = logging.getLogger('FortniteData.cogs.general')
 
@@ -36,7 +36,9 @@ class General(commands.Cog):
         query: Option(
             str,
             description = 'Name or ID of the cosmetic',
-            required = True
+            required = False,
+            default = None,
+            autocomplete = views.autocomplete_cosmetics
         ),
         match_method: Option(
             str,
@@ -45,9 +47,72 @@ class General(commands.Cog):
             default = 'contains',
             choices = [
                 OptionChoice(name='Starts', value='starts'),
-                OptionChoice(name='Contains', value='contains')
+                OptionChoice(name='Contains', value='contains'),
+                OptionChoice(name='Fuzzy', value='fuzzy')
+            ]
+        ),
+        cosmetic_type: Option(
+            str,
+            description = 'Only cosmetics of this type',
+            required = False,
+            default = None,
+            choices = [
+                OptionChoice(name='Outfit', value='outfit'),
+                OptionChoice(name='Back Bling', value='backpack'),
+                OptionChoice(name='Pickaxe', value='pickaxe'),
+                OptionChoice(name='Glider', value='glider'),
+                OptionChoice(name='Contrail', value='contrail'),
+                OptionChoice(name='Emote', value='emote'),
+                OptionChoice(name='Wrap', value='wrap'),
+                OptionChoice(name='Loading Screen', value='loadingscreen'),
+                OptionChoice(name='Spray', value='spray'),
+                OptionChoice(name='Banner', value='banner'),
+                OptionChoice(name='Music', value='music'),
+                OptionChoice(name='Pet', value='pet'),
+                OptionChoice(name='Emoticon', value='emoji'),
+                OptionChoice(name='Toy', value='toy')
             ]
         ),
+        rarity: Option(
+            str,
+            description = 'Only cosmetics of this rarity',
+            required = False,
+            default = None,
+            choices = [
+                OptionChoice(name='Common', value='common'),
+                OptionChoice(name='Uncommon', value='uncommon'),
+                OptionChoice(name='Rare', value='rare'),
+                OptionChoice(name='Epic', value='epic'),
+                OptionChoice(name='Legendary', value='legendary'),
+                OptionChoice(name='Mythic', value='mythic')
+            ]
+        ),
+        series: Option(
+            str,
+            description = 'Only cosmetics of this series',
+            required = False,
+            default = None
+        ),
+        cosmetic_set: Option(
+            str,
+            description = 'Only cosmetics of this set',
+            required = False,
+            default = None
+        ),
+        chapter: Option(
+            int,
+            description = 'Only cosmetics introduced in this chapter',
+            required = False,
+            default = None,
+            min_value = 1
+        ),
+        season: Option(
+            int,
+            description = 'Only cosmetics introduced in this season',
+            required = False,
+            default = None,
+            min_value = 1
+        ),
         language: Option(
             str,
             description = 'Language to use',
@@ -66,7 +131,17 @@ class General(commands.Cog):
         if language != 'none':
             lang = language
 
-        if query == None:
+        filters = {
+            'rarity': rarity,
+            'series': series,
+            'set': cosmetic_set,
+            'chapter': chapter,
+            'season': season
+        }
+
+        has_filters = cosmetic_type != None or any(value != None for value in filters.values())
+
+        if query == None and has_filters == False:
 
             await ctx.respond(embed=discord.Embed(
                 description = util.get_str(lang, 'command_string_item_missing_parameters').format(prefix = ctx.prefix),
@@ -84,9 +159,14 @@ class General(commands.Cog):
                 ))
                 return
 
-            log.debug(f'Searching cosmetics with args: "{query}"')
+            log.debug(f'Searching cosmetics with args: "{query}", filters: {filters}')
 
-            results = await util.fortniteapi[lang].get_cosmetic(query = query, match_method = match_method)
+            results = await util.fortniteapi[lang].get_cosmetic(
+                query = query,
+                match_method = match_method,
+                cosmetic_types = [cosmetic_type] if cosmetic_type != None else None,
+                **filters
+            )
 
             if results == False:
                 await ctx.respond(embed=discord.Embed(
@@ -94,7 +174,16 @@ class General(commands.Cog):
                     color = util.Colors.ORANGE
                 ))
                 return
-                
+
+            if len(results) == 0 and query != None and match_method != 'fuzzy': # probably a typo, try the closest names
+
+                log.debug(f'No exact results for "{query}", falling back to fuzzy search')
+                results = await util.fortniteapi[lang].get_cosmetic(
+                    query = query,
+                    match_method = 'fuzzy',
+                    cosmetic_types = [cosmetic_type] if cosmetic_type != None else None,
+                    **filters
+                )
 
             if len(results) == 0:
 
@@ -106,11 +195,7 @@ class General(commands.Cog):
 
             else:
 
-                items = []
-                count = 0
-
-                for cosmetic in results:
-                    count += 1
+                def render(index, cosmetic, total):
 
                     i = discord.Embed(
                         title = f'{cosmetic["type"]["displayValue"]}',
@@ -137,12 +222,12 @@ class General(commands.Cog):
 
                     i.set_thumbnail(url=cosmetic['images']['icon'])
 
-                    i.set_footer(text=util.get_str(lang, 'command_string_result_int_of_int').format(count = count, results = len(results)))
+                    i.set_footer(text=util.get_str(lang, 'command_string_result_int_of_int').format(count = index + 1, results = total))
+
+                    return i
 
-                    items.append(i)
-    
                 paginator = pages.Paginator(
-                    pages = items
+                    pages = views.LazyPages(results, render)
                 )
                 await paginator.respond(interaction = ctx.interaction)
 
@@ -166,7 +251,8 @@ class General(commands.Cog):
         query: Option(
             str,
             description = 'Name or ID of the playlist',
-            required = True
+            required = True,
+            autocomplete = views.autocomplete_playlists
         ),
         match_method: Option(
             str,
@@ -228,11 +314,7 @@ class General(commands.Cog):
 
                 else:
 
-                    items = []
-                    count = 0
-
-                    for playlist in results:
-                        count += 1
+                    def render(index, playlist, total):
 
                         if playlist['description'] != None:
                             playlist_description = playlist['description']
@@ -263,12 +345,12 @@ class General(commands.Cog):
                         if playlist['images']['showcase']:
                             i.set_image(url=playlist['images']['showcase'])
 
-                        i.set_footer(text=util.get_str(lang, 'command_string_result_int_of_int').format(count = count, results = len(results)))
+                        i.set_footer(text=util.get_str(lang, 'command_string_result_int_of_int').format(count = index + 1, results = total))
 
-                        items.append(i)
+                        return i
 
                     paginator = pages.Paginator(
-                        pages = items
+                        pages = views.LazyPages(results, render)
                     )
                     await paginator.respond(interaction = ctx.interaction)
 
@@ -292,7 +374,8 @@ class General(commands.Cog):
         query: Option(
             str,
             description = 'Name or id to search',
-            required = True
+            required = True,
+            autocomplete = views.autocomplete_sections
         ),
         match_method: Option(
             str,
@@ -327,35 +410,16 @@ class General(commands.Cog):
         async with aiofiles.open(f'cache/shopsections/current.json', 'r', encoding='utf-8') as f:
             active_sections = json.loads(await f.read())
 
-        async with aiofiles.open(f'cache/shopsections/sections_{lang}.json', 'r', encoding='utf-8') as f:
-            sections = json.loads(await f.read())
-
-        embeds = []
-        for section in sections:
-            
-            if match_method == 'starts':
-
-                continueCount = 0
-                if not section.get('sectionId', '').lower().startswith(query.lower()):
-                    continueCount += 1
-
-                if not section.get('sectionDisplayName', '').lower().startswith(query.lower()):
-                    continueCount += 1
-
-                if continueCount >= 2:
-                    continue
-
-            elif match_method == 'contains':
+        sections = await util.get_shop_sections(lang)
 
-                continueCount = 0
-                if not query.lower() in section.get('sectionId', '').lower():
-                    continueCount += 1
+        if match_method == 'starts':
+            handles = set(sections.search_starts(query)) | set(sections.search_starts(query, by_id = True))
+        else:
+            handles = set(sections.search_contains(query)) | set(sections.search_contains(query, by_id = True))
 
-                if not query.lower() in section.get('sectionDisplayName', '').lower():
-                    continueCount += 1
+        results = sections.resolve(sorted(handles))
 
-                if continueCount >= 2:
-                    continue
+        def render(index, section, total):
 
             embed = discord.Embed(
                 title = 'Shop Sections',
@@ -383,12 +447,12 @@ class General(commands.Cog):
                 value = util.get_str(lang, 'command_string_yes') if section.get('bEnableToastNotification', False) == True else util.get_str(lang, 'command_string_no')
             )
 
-            if section.get('sectionId', '') in list(active_sections.keys()):
+            if section.get('sectionId', '') in active_sections:
                 embed.set_footer(text = util.get_str(lang, 'command_string_section_active_notice'))
-            
-            embeds.append(embed)
 
-        if len(embeds) == 0:
+            return embed
+
+        if len(results) == 0:
             await ctx.respond(embed=discord.Embed(
                 description = util.get_str(lang, 'command_string_no_sections_found'),
                 color = util.Colors.RED
@@ -396,7 +460,7 @@ class General(commands.Cog):
             return
 
         paginator = pages.Paginator(
-            pages = embeds
+            pages = views.LazyPages(results, render)
         )
         await paginator.respond(interaction = ctx.interaction)
 
@@ -476,34 +540,31 @@ class General(commands.Cog):
         
         else:
 
-            items = []
+            items = [] # (title string, message)
 
             if data['data']['br'] != None:
                 for motd in data['data']['br']['motds']:
-
-                    embed = discord.Embed(
-                        title = util.get_str(lang, 'command_button_battle_royale'),
-                        description = f'**{motd["title"]}**\n{motd["body"]}',
-                        color = util.Colors.BLUE
-                    )
-                    embed.set_image(url=motd['image'])
-                    
-                    items.append(embed)
+                    items.append(('command_button_battle_royale', motd))
 
             if data['data']['stw'] != None:
                 for message in data['data']['stw']['messages']:
+                    items.append(('command_button_save_the_world', message))
 
-                    embed = discord.Embed(
-                        title = util.get_str(lang, 'command_button_save_the_world'),
-                        description = f'**{message["title"]}**\n{message["body"]}',
-                        color = util.Colors.BLUE
-                    )
-                    embed.set_image(url=message['image'])
-                    
-                    items.append(embed)
+            def render(index, item, total):
+
+                title, message = item
+
+                embed = discord.Embed(
+                    title = util.get_str(lang, title),
+                    description = f'**{message["title"]}**\n{message["body"]}',
+                    color = util.Colors.BLUE
+                )
+                embed.set_image(url=message['image'])
+
+                return embed
 
             paginator = pages.Paginator(
-                pages = items
+                pages = views.LazyPages(items, render)
             )
             await paginator.respond(interaction = ctx.interaction)
 
@@ -795,13 +856,7 @@ class General(commands.Cog):
 
         else:
 
-            items = []
-
-            count = 0
-
-            for cosmetic in data['data']['items']:
-
-                count += 1
+            def render(index, cosmetic, total):
 
                 i = discord.Embed(
                     title = util.get_str(lang, 'command_string_upcoming_cosmetics'),
@@ -817,12 +872,12 @@ class General(commands.Cog):
 
                 i.set_thumbnail(url=cosmetic['images']['icon'])
 
-                i.set_footer(text=util.get_str(lang, 'command_string_result_int_of_int').format(count = count, results = len(data['data']['items'])))
+                i.set_footer(text=util.get_str(lang, 'command_string_result_int_of_int').format(count = index + 1, results = total))
 
-                items.append(i)
+                return i
 
             paginator = pages.Paginator(
-                pages = items
+                pages = views.LazyPages(data['data']['items'], render)
             )
             await paginator.respond(interaction = ctx.interaction) 
     
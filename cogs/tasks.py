@@ -3,14 +3,15 @@ from discord.ext import commands, tasks
 import traceback
 import aiofiles
 import discord
-import aiohttp
 import logging
 import asyncio
 import json
 import time
 import sys
 
-from modules import util
+from modules.schedule import RotationSchedule
+from modules.catalog import SectionCatalog
+from modules import util, api, snapshot
 
 log = logging.getLogger('FortniteData.cogs.tasks')
 
@@ -18,7 +19,15 @@ class Tasks(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.ClientSession = aiohttp.ClientSession
+
+        # rate limits, retries and circuit breakers of the api layer cover these too
+        self.nitestats = api.API(name = 'NiteStats', base_url = 'https://api.nitestats.com')
+        self.baydev = api.BaydevAPI()
+
+        self.languages_semaphore = asyncio.Semaphore(util.configuration.get('language_concurrency', 4)) # languages checked at the same time
+        self.updates_lock = asyncio.Lock() # prefetch and updates_check never announce the same change twice
+
+        self.schedule = RotationSchedule(**util.configuration.get('schedule', {})) # poll intervals follow the shop rotation
 
         self.topgg_stats_execution_count = 0
         self.updates_execution_count = 0
@@ -32,6 +41,8 @@ class Tasks(commands.Cog):
 
         log.debug('Starting tasks...')
         try:
+            self.prefetch.change_interval(time = self.schedule.warm_times())
+            self.prefetch.start()
             self.shop_check.start()
             self.updates_check.start()
             self.topgg_stats.start()
@@ -77,7 +88,7 @@ class Tasks(commands.Cog):
 
             elif options[self.current_status_option] == 'cosmetics_count':
 
-                cosmeticCount = len(util.fortniteapi['en'].all_cosmetics)
+                cosmeticCount = len(util.fortniteapi['en'].catalog)
 
                 await self.bot.change_presence(
                     activity = discord.Activity(
@@ -132,13 +143,11 @@ class Tasks(commands.Cog):
                 'server_count': len(self.bot.guilds)
             }
 
-            async with self.ClientSession() as session:
-                
-                request = await session.post(
-                    url = 'https://top.gg/api/bots/729409703360069722/stats',
-                    headers = headers,
-                    data = json.dumps(body)
-                )
+            async with api.get_session().post(
+                url = 'https://top.gg/api/bots/729409703360069722/stats',
+                headers = headers,
+                data = json.dumps(body)
+            ) as request:
 
                 if request.status == 200:
                     log.debug('Posted stats to top.gg')
@@ -157,6 +166,8 @@ class Tasks(commands.Cog):
 
         self.shopcheck_execution_count += 1
 
+        api.background.set(True) # polls every few seconds after a rotation, commands keep priority
+
         while True:
             if util.ready == True: # only if bot ready
                 break
@@ -165,6 +176,8 @@ class Tasks(commands.Cog):
 
         log.debug('Executing "tasks.shop_check" task')
 
+        self.shop_check.change_interval(seconds = self.schedule.shop_interval()) # counted from this iteration's start
+
         try: # compare shop hash
 
             log.debug('Comparing shop hash...')
@@ -172,12 +185,13 @@ class Tasks(commands.Cog):
             async with aiofiles.open('cache/shop/shophash.json', 'r', encoding='utf-8') as f:
                 cached_shop_hash = json.loads(await f.read())
             
-            async with self.ClientSession() as session:
-                request = await session.get('https://api.nitestats.com/v1/shop/shophash')
-                if request.status != 200:
-                    log.error(f'An error ocurred in shop_check task. The shophash online returned status {request.status}')
-                else:
-                    current_shop_hash = await request.text()
+            response = await self.nitestats.send_request('GET', '/v1/shop/shophash')
+
+            if response.status != 200:
+                log.error(f'An error ocurred in shop_check task. The shophash online returned status {response.status}')
+                return
+            else:
+                current_shop_hash = await response.text()
 
             if current_shop_hash == cached_shop_hash['shophash']: # no changes
                 log.debug('Shop hash compared, no changes found.')
@@ -192,13 +206,12 @@ class Tasks(commands.Cog):
                 log.debug('Waiting for nitestats for the shop image...')
                 while True:
 
-                    async with self.ClientSession() as session:
-                        request = await session.get('https://api.nitestats.com/v1/shop/image')
+                    response = await self.nitestats.send_request('GET', '/v1/shop/image')
 
-                        if request.status == 200:
+                    if response.status == 200:
 
-                            if request.headers['Content-Type'] == 'image/png':
-                                break # image should be ready
+                        if response.content_type == 'image/png':
+                            break # image should be ready
 
                     await asyncio.sleep(5) # image isn't ready, next check will be in 5 seconds
 
@@ -215,6 +228,8 @@ class Tasks(commands.Cog):
 
         self.updates_execution_count += 1
 
+        api.background.set(True) # this task's upstream requests yield to commands
+
         while True:
             if util.ready == True: # start checking only if the bot is completely ready
                 break
@@ -222,314 +237,328 @@ class Tasks(commands.Cog):
                 await asyncio.sleep(1)
 
         log.debug('Executing "tasks.updates_check" task')
+        log.debug(f'Search cache stats: {util.search_cache.stats()}')
+        log.debug(f'Coalesced upstream requests: {api.inflight.coalesced}')
+        log.debug(f'Response cache stats: {api.response_cache.stats()}')
+        log.debug(f'Upstream circuits: {api.breaker_status()}')
 
-        try: # New cosmetics
+        self.updates_check.change_interval(seconds = self.schedule.updates_interval())
 
-            log.debug('Checking cosmetic updates...')
+        log.debug(f'Schedule phase is "{self.schedule.phase()}", next update check in {self.updates_check.seconds:.0f} seconds.')
 
-            for lang in util.configuration['languages']:
+        await self._check_updates()
 
-                async with aiofiles.open(f'cache/cosmetics/all_{lang}.json', 'r', encoding='utf-8') as f:
-                    cached_cosmetics = json.loads(await f.read())
-                new_cosmetics = await util.fortniteapi[lang]._load_cosmetics()
+    ###
+    ## Prefetch right before the shop rotation
+    ###
+    @tasks.loop(hours=24) # run times are set from the schedule in __init__
+    async def prefetch(self):
 
-                cached_cosmetic_ids = [i['id'] for i in cached_cosmetics['data']] # List of every cosmetic ID
+        api.background.set(True)
 
-                start_timestamp = time.time()
-                new_cosmetics_list = []
+        while True:
+            if util.ready == True:
+                break
+            else:
+                await asyncio.sleep(1)
 
-                for cosmetic in new_cosmetics:
+        log.debug('Executing "tasks.prefetch" task')
 
-                    if cosmetic['id'] not in cached_cosmetic_ids:
+        # catalogs, news and sections are brought up to date, the checks after the rotation only see the rotation itself
+        await self._check_updates()
 
-                        new_cosmetics_list.append(cosmetic)
+    async def _check_updates(self):
 
+        async with self.updates_lock:
 
-                if len(new_cosmetics_list) > 0:
+            # every language at once, language neutral endpoints once per cycle
+            start_timestamp = time.time()
 
-                    log.debug(f'Building embeds for {len(new_cosmetics_list)} new cosmetics...')
+            await asyncio.gather(
+                self._for_languages('cosmetics', self._check_cosmetics),
+                self._for_languages('playlists', self._check_playlists),
+                self._for_languages('ingame news', self._check_news),
+                self._check_aes(),
+                self._check_shop_sections()
+            )
 
-                    embeds = []
+            log.debug(f'Checked updates in {time.time() - start_timestamp:.2f} seconds.')
 
-                    count = 0
-                    for i in new_cosmetics_list:
+    async def _for_languages(self, name: str, check):
 
-                        color = str(util.get_color_by_rarity(i['rarity']['value']))
+        # the semaphore bounds how many languages hit the upstream at the same time
+        async def run(lang):
 
-                        embed = DiscordEmbed()
-                        if count == 0:
-                            embed.set_author(name=util.get_str(lang, 'update_message_string_new_cosmetics_detected'))
+            async with self.languages_semaphore:
 
-                        embed.title = f'{i["name"]}'
+                try:
+                    await check(lang)
+                except Exception:
+                    log.error(f'[{lang}] Failed while checking {name} changes. Traceback:\n{traceback.format_exc()}')
 
-                        embed.description = f'{i["description"]}'
+        await asyncio.gather(*[run(lang) for lang in util.configuration['languages']])
 
-                        embed.color = color.replace('0x', '')
+    async def _check_cosmetics(self, lang: str):
 
-                        embed.add_embed_field(name=util.get_str(lang, 'command_string_id'), value=f'`{i["id"]}`', inline=False)
+        delta = await util.fortniteapi[lang]._load_cosmetics() # compared against the cached cosmetics, empty on a 304
 
-                        embed.add_embed_field(name=util.get_str(lang, 'command_string_type'), value=f'`{i["type"]["displayValue"]}`', inline=False)
+        start_timestamp = time.time()
 
-                        embed.add_embed_field(name=util.get_str(lang, 'command_string_rarity'), value=f'`{i["rarity"]["displayValue"]}`', inline=False)
+        catalog = util.fortniteapi[lang].catalog
+        new_cosmetics_list = [catalog.get(cosmetic_id) for cosmetic_id in delta['added']]
 
-                        if i['introduction'] != None:
-                            embed.add_embed_field(name=util.get_str(lang, 'command_string_introduction'), value=f'`{i["introduction"]["text"]}`', inline=False)
-                        else:
-                            embed.add_embed_field(name=util.get_str(lang, 'command_string_introduction'), value=util.get_str(lang, 'command_string_not_introduced_yet'), inline=False)
+        if len(new_cosmetics_list) > 0:
 
-                        if i['set'] != None:
-                            embed.add_embed_field(name=util.get_str(lang, 'command_string_set'), value=f'`{i["set"]["text"]}`', inline=False)
-                        else:
-                            embed.add_embed_field(name=util.get_str(lang, 'command_string_set'), value=util.get_str(lang, 'command_string_none'), inline=False)
+            log.debug(f'Building embeds for {len(new_cosmetics_list)} new cosmetics...')
 
-                        embed.set_thumbnail(url=i['images']['icon'])
-                        count += 1
+            embeds = []
 
-                        if count == len(new_cosmetics):
-                            embed.set_footer(text=util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(new_cosmetics_list)))
-                        else:
-                            embed.set_footer(text=util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(new_cosmetics_list)))
+            count = 0
+            for i in new_cosmetics_list:
+
+                color = str(util.get_color_by_rarity(i['rarity']['value']))
+
+                embed = DiscordEmbed()
+                if count == 0:
+                    embed.set_author(name=util.get_str(lang, 'update_message_string_new_cosmetics_detected'))
+
+                embed.title = f'{i["name"]}'
 
+                embed.description = f'{i["description"]}'
 
-                        embeds.append(embed)
+                embed.color = color.replace('0x', '')
 
-                    result = await self.updates_channel_send(embeds=embeds, type_='cosmetics', lang=lang)
+                embed.add_embed_field(name=util.get_str(lang, 'command_string_id'), value=f'`{i["id"]}`', inline=False)
 
-                    log.debug(f'Sent {len(embeds)} embeds to {len(result)} guilds in {int((time.time() - start_timestamp))} seconds! - Status: {result}')
-                
+                embed.add_embed_field(name=util.get_str(lang, 'command_string_type'), value=f'`{i["type"]["displayValue"]}`', inline=False)
+
+                embed.add_embed_field(name=util.get_str(lang, 'command_string_rarity'), value=f'`{i["rarity"]["displayValue"]}`', inline=False)
+
+                if i['introduction'] != None:
+                    embed.add_embed_field(name=util.get_str(lang, 'command_string_introduction'), value=f'`{i["introduction"]["text"]}`', inline=False)
                 else:
+                    embed.add_embed_field(name=util.get_str(lang, 'command_string_introduction'), value=util.get_str(lang, 'command_string_not_introduced_yet'), inline=False)
 
-                    log.debug('No cosmetic changes detected.')
-                    if self.updates_execution_count == 1:
-                        continue # in order to load cosmetics to every language at startup
-                    else:
-                        break
+                if i['set'] != None:
+                    embed.add_embed_field(name=util.get_str(lang, 'command_string_set'), value=f'`{i["set"]["text"]}`', inline=False)
+                else:
+                    embed.add_embed_field(name=util.get_str(lang, 'command_string_set'), value=util.get_str(lang, 'command_string_none'), inline=False)
 
-        except Exception:
-            log.error(f'Failed while checking upcoming cosmetics changes. Traceback:\n{traceback.format_exc()}')
+                embed.set_thumbnail(url=i['images']['icon'])
+                count += 1
 
-        try: # playlists
+                if count == len(new_cosmetics_list):
+                    embed.set_footer(text=util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(new_cosmetics_list)))
+                else:
+                    embed.set_footer(text=util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(new_cosmetics_list)))
 
-            log.debug('Checking playlists updates...')
 
-            start_timestamp = time.time()
+                embeds.append(embed)
 
-            for lang in util.configuration['languages']:
+            result = await self.updates_channel_send(embeds=embeds, type_='cosmetics', lang=lang)
 
-                async with aiofiles.open(f'cache/playlists/{lang}.json', 'r', encoding='utf-8') as f:
-                    cached_playlists = json.loads(await f.read())
+            log.debug(f'Sent {len(embeds)} embeds to {len(result)} guilds in {int((time.time() - start_timestamp))} seconds! - Status: {result}')
 
-                new_playlists = await util.fortniteapi[lang]._load_playlists()
+        else:
+            log.debug(f'[{lang}] No cosmetic changes detected.')
 
-                added_playlists = []
+    async def _check_playlists(self, lang: str):
 
-                if len(cached_playlists) != len(new_playlists):
+        start_timestamp = time.time()
 
-                    to_send_list = []
+        delta = await util.fortniteapi[lang]._load_playlists()
 
-                    for playlist in new_playlists:
-                        if playlist not in cached_playlists:
+        playlists = util.fortniteapi[lang].playlists
+        added_playlists = []
 
-                            if playlist['name'] == playlist['description']: # basically no usefull info
-                                continue # for example "CREATIVE MATCHMAKING"
+        if len(delta['added']) != 0:
 
-                            added_playlists.append(playlist)
+            to_send_list = []
 
-                    if len(added_playlists) != 0:
+            for playlist in map(playlists.get, delta['added']):
 
-                        count = 0
+                if playlist['name'] == playlist['description']: # basically no usefull info
+                    continue # for example "CREATIVE MATCHMAKING"
 
-                        for playlist in added_playlists:
+                added_playlists.append(playlist)
 
-                            embed = DiscordEmbed()
-                            if count == 0:
-                                embed.set_author(name=util.get_str(lang, 'update_message_string_new_playlists_detected'))
+            if len(added_playlists) != 0:
 
-                            embed.title = playlist['name']
+                count = 0
 
-                            if playlist['description'] != None:
-                                embed.description = playlist['description']
-                            
-                            else:
-                                embed.description = util.get_str(lang, 'update_message_string_playlist_no_description')
+                for playlist in added_playlists:
 
-                            embed.color = 0x3498db
+                    embed = DiscordEmbed()
+                    if count == 0:
+                        embed.set_author(name=util.get_str(lang, 'update_message_string_new_playlists_detected'))
 
-                            if playlist['images']['showcase'] != None:
-                                embed.set_image(url = playlist['images']['showcase'])
+                    embed.title = playlist['name']
 
-                            footer_icon = None
-                            if playlist['images']['missionIcon'] != None:
-                                footer_icon = playlist['images']['missionIcon']
+                    if playlist['description'] != None:
+                        embed.description = playlist['description']
 
-                            count += 1
+                    else:
+                        embed.description = util.get_str(lang, 'update_message_string_playlist_no_description')
 
-                            if count == len(added_playlists):
-                                embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(added_playlists)), icon_url = footer_icon)
-                            else:
-                                embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(added_playlists)), icon_url = footer_icon)
-                            
-                            to_send_list.append(embed)
+                    embed.color = 0x3498db
 
-                    async with aiofiles.open(f'cache/playlists/{lang}.json', 'w', encoding='utf-8') as f:
-                        await f.write(json.dumps(new_playlists))
+                    if playlist['images']['showcase'] != None:
+                        embed.set_image(url = playlist['images']['showcase'])
 
-                    result = await self.updates_channel_send(embeds=to_send_list, type_='playlists', lang=lang)
+                    footer_icon = None
+                    if playlist['images']['missionIcon'] != None:
+                        footer_icon = playlist['images']['missionIcon']
 
-                    log.debug(f'Sent {len(to_send_list)} embeds to {len(result)} guilds in {int((time.time() - start_timestamp))} seconds! - Status: {result}')
+                    count += 1
 
-                else:
-                    if self.updates_execution_count == 1:
-                        continue # playlists need some love at startup too
+                    if count == len(added_playlists):
+                        embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(added_playlists)), icon_url = footer_icon)
                     else:
-                        break
+                        embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(added_playlists)), icon_url = footer_icon)
 
+                    to_send_list.append(embed)
 
-        except:
-            log.error(f'Failed while checking playlists changes. Traceback:\n{traceback.format_exc()}')
+            result = await self.updates_channel_send(embeds=to_send_list, type_='playlists', lang=lang)
 
-        try: # ingame news
+            log.debug(f'Sent {len(to_send_list)} embeds to {len(result)} guilds in {int((time.time() - start_timestamp))} seconds! - Status: {result}')
 
-            log.debug('Checking ingame news updates...')
+        else:
+            log.debug(f'[{lang}] No playlist changes detected.')
 
-            start_timestamp = time.time()
+    async def _check_news(self, lang: str):
 
-            for lang in util.configuration['languages']:
+        start_timestamp = time.time()
 
-                async with aiofiles.open(f'cache/news/{lang}.json', 'r', encoding='utf-8') as f:
-                    cached_news = json.loads(await f.read())
-                new_news = await util.fortniteapi[lang].get_news(language = lang)
+        cached_news = await snapshot.read_json(f'cache/news/{lang}.json')
+        new_news = await util.fortniteapi[lang].get_news(language = lang, cache = False) # a stale cached answer would find changes a poll late
 
-                to_send_list = []
+        to_send_list = []
 
-                if new_news['data']['br'] != None:
+        if new_news['data']['br'] != None:
 
-                    br_motds = []
+            br_motds = []
 
-                    if cached_news['data']['br']['hash'] != new_news['data']['br']['hash']:
+            if cached_news['data']['br']['hash'] != new_news['data']['br']['hash']:
 
-                        for motd in new_news['data']['br']['motds']:
-                            if motd not in cached_news['data']['br']['motds']:
-                                br_motds.append(motd)
+                for motd in new_news['data']['br']['motds']:
+                    if motd not in cached_news['data']['br']['motds']:
+                        br_motds.append(motd)
 
-                        sorted_br_motds = sorted(br_motds, key = lambda x: x['sortingPriority'], reverse = True)
-                        count = 0
-                        for motd in sorted_br_motds:
+                sorted_br_motds = sorted(br_motds, key = lambda x: x['sortingPriority'], reverse = True)
+                count = 0
+                for motd in sorted_br_motds:
 
-                            embed = DiscordEmbed()
-                            if count == 0:
-                                embed.set_author(name=util.get_str(lang, 'update_message_string_br_news_updated'))
+                    embed = DiscordEmbed()
+                    if count == 0:
+                        embed.set_author(name=util.get_str(lang, 'update_message_string_br_news_updated'))
 
-                            embed.title = motd['title']
+                    embed.title = motd['title']
 
-                            embed.description = motd['body']
+                    embed.description = motd['body']
 
-                            embed.color = 0x3498db
+                    embed.color = 0x3498db
 
-                            embed.set_image(url = motd['image'])
+                    embed.set_image(url = motd['image'])
 
-                            count += 1
+                    count += 1
 
-                            if count == len(br_motds):
-                                embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(sorted_br_motds)))
-                            else:
-                                embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(sorted_br_motds)))
-                            
-                            to_send_list.append(embed)
-                    
+                    if count == len(br_motds):
+                        embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(sorted_br_motds)))
                     else:
-                        log.debug(f'[{lang}] No br news changes found')
+                        embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(sorted_br_motds)))
+
+                    to_send_list.append(embed)
+
+            else:
+                log.debug(f'[{lang}] No br news changes found')
 
-                if new_news['data']['creative'] != None:
+        if new_news['data']['creative'] != None:
 
-                    cr_motds = []
+            cr_motds = []
 
-                    if cached_news['data']['creative']['hash'] != new_news['data']['creative']['hash']:
+            if cached_news['data']['creative']['hash'] != new_news['data']['creative']['hash']:
 
-                        for motd in new_news['data']['creative']['motds']:
-                            if motd not in cached_news['data']['creative']['motds']:
-                                cr_motds.append(motd)
+                for motd in new_news['data']['creative']['motds']:
+                    if motd not in cached_news['data']['creative']['motds']:
+                        cr_motds.append(motd)
 
-                        sorted_cr_motds = sorted(cr_motds, key = lambda x: x['sortingPriority'], reverse = True)
-                        count = 0
-                        for motd in sorted_cr_motds:
+                sorted_cr_motds = sorted(cr_motds, key = lambda x: x['sortingPriority'], reverse = True)
+                count = 0
+                for motd in sorted_cr_motds:
 
-                            embed = DiscordEmbed()
-                            if count == 0:
-                                embed.set_author(name=util.get_str(lang, 'update_message_string_creative_news_updated'))
+                    embed = DiscordEmbed()
+                    if count == 0:
+                        embed.set_author(name=util.get_str(lang, 'update_message_string_creative_news_updated'))
 
-                            embed.title = motd['title']
+                    embed.title = motd['title']
 
-                            embed.description = motd['body']
+                    embed.description = motd['body']
 
-                            embed.color = 0x3498db
+                    embed.color = 0x3498db
 
-                            embed.set_image(url = motd['image'])
+                    embed.set_image(url = motd['image'])
 
-                            count += 1
+                    count += 1
 
-                            if count == len(sorted_cr_motds):
-                                embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(sorted_cr_motds)))
-                            else:
-                                embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(sorted_cr_motds)))
-                            
-                            to_send_list.append(embed)
-                    
+                    if count == len(sorted_cr_motds):
+                        embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(sorted_cr_motds)))
                     else:
-                        log.debug(f'[{lang}] No creative news changes found')
+                        embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(sorted_cr_motds)))
+
+                    to_send_list.append(embed)
+
+            else:
+                log.debug(f'[{lang}] No creative news changes found')
 
-                if new_news['data']['stw'] != None:
+        if new_news['data']['stw'] != None:
 
-                    stw_motds = []
+            stw_motds = []
 
-                    if cached_news['data']['stw']['hash'] != new_news['data']['stw']['hash']:
+            if cached_news['data']['stw']['hash'] != new_news['data']['stw']['hash']:
 
-                        for motd in new_news['data']['stw']['messages']:
-                            if motd not in cached_news['data']['stw']['messages']:
-                                stw_motds.append(motd)
+                for motd in new_news['data']['stw']['messages']:
+                    if motd not in cached_news['data']['stw']['messages']:
+                        stw_motds.append(motd)
 
-                        count = 0
-                        for motd in stw_motds:
+                count = 0
+                for motd in stw_motds:
 
-                            embed = DiscordEmbed()
-                            if count == 0:
-                                embed.set_author(name=util.get_str(lang, 'update_message_string_stw_news_updated'))
+                    embed = DiscordEmbed()
+                    if count == 0:
+                        embed.set_author(name=util.get_str(lang, 'update_message_string_stw_news_updated'))
 
-                            embed.title = motd['title']
+                    embed.title = motd['title']
 
-                            embed.description = motd['body']
+                    embed.description = motd['body']
 
-                            embed.color = 0x3498db
+                    embed.color = 0x3498db
 
-                            embed.set_image(url = motd['image'])
+                    embed.set_image(url = motd['image'])
 
-                            count += 1
+                    count += 1
 
-                            if count == len(stw_motds):
-                                embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(br_motds)))
-                            else:
-                                embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(br_motds)))
-                            
-                            to_send_list.append(embed)
-                    
+                    if count == len(stw_motds):
+                        embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int_with_credits').format(count = count, total = len(br_motds)))
                     else:
-                        log.debug(f'[{lang}] No stw news changes found')
+                        embed.set_footer(text = util.get_str(lang, 'command_string_int_of_int').format(count = count, total = len(br_motds)))
 
-                if len(to_send_list) != 0:
+                    to_send_list.append(embed)
 
-                    async with aiofiles.open(f'cache/news/{lang}.json', 'w', encoding='utf-8') as f:
-                        await f.write(json.dumps(new_news))
+            else:
+                log.debug(f'[{lang}] No stw news changes found')
 
-                    result = await self.updates_channel_send(embeds=to_send_list, type_='news', lang=lang)
+        if len(to_send_list) != 0:
 
-                    log.debug(f'Sent {len(to_send_list)} embeds to {len(result)} guilds in {int((time.time() - start_timestamp))} seconds! - Status: {result}')
+            await snapshot.write_json(f'cache/news/{lang}.json', new_news)
 
-                else:
+            result = await self.updates_channel_send(embeds=to_send_list, type_='news', lang=lang)
 
-                    break
+            log.debug(f'Sent {len(to_send_list)} embeds to {len(result)} guilds in {int((time.time() - start_timestamp))} seconds! - Status: {result}')
 
-        except:
-            log.error(f'Failed while checking ingame news changes. Traceback:\n{traceback.format_exc()}')
+        else:
+            log.debug(f'[{lang}] No ingame news changes detected.')
+
+    async def _check_aes(self):
 
         try: # aes (using hex format)
 
@@ -539,9 +568,8 @@ class Tasks(commands.Cog):
 
             thereIsChanges = False
 
-            async with aiofiles.open('cache/aes/hex.json', 'r', encoding='utf-8') as f:
-                cached_aes = json.loads(await f.read())
-            new_aes = await util.fortniteapi[lang].get_aes()
+            cached_aes = await snapshot.read_json('cache/aes/hex.json')
+            new_aes = await util.fortniteapi[util.configuration['languages'][0]].get_aes(cache = False) # same keys for every language
 
             for lang in util.configuration['languages']:
 
@@ -614,13 +642,12 @@ class Tasks(commands.Cog):
                         to_send_list.append(embed)
 
                 if thereIsChanges == False:
-                    break
+                    return
 
                 else:
 
                     if lang == util.configuration['languages'][0]: # only update cache once
-                        async with aiofiles.open(f'cache/aes/hex.json', 'w', encoding='utf-8') as f:
-                            await f.write(json.dumps(new_aes))
+                        await snapshot.write_json('cache/aes/hex.json', new_aes)
 
                     result = await self.updates_channel_send(embeds=to_send_list, type_='aes', lang=lang)
 
@@ -631,20 +658,19 @@ class Tasks(commands.Cog):
         except:
             log.error(f'Failed while checking aes changes. Traceback:\n{traceback.format_exc()}')
 
+    async def _check_shop_sections(self):
 
-        try: # shop sections
+        try:
 
             log.debug('Checking shop section updates...')
 
-            start_timestamp = time.time()
+            response = await self.baydev.send_request('GET', '/v1/shopsections')
 
-            async with self.ClientSession() as session:
-                request = await session.get('https://baydev.net/api/v1/shopsections')
-                if request.status != 200:
-                    log.error(f'An error ocurred in updates_check task. API returned status {request.status}')
-                    return
-                else:
-                    current_sections = await request.json()
+            if response.status != 200:
+                log.error(f'An error ocurred in updates_check task. API returned status {response.status}')
+                return
+            else:
+                current_sections = await response.json()
 
             active_sections = current_sections['data']
 
@@ -657,7 +683,7 @@ class Tasks(commands.Cog):
             if actives == cacheds:
                 log.debug('No changes in shop sections.')
                 return
-            
+
             else:
 
                 log.debug('Detected shop section changes')
@@ -665,117 +691,123 @@ class Tasks(commands.Cog):
                 async with aiofiles.open('cache/shopsections/current.json', 'w', encoding='utf-8') as f:
                     await f.write(json.dumps(active_sections))
 
-                for lang in util.configuration['languages']:
+                await self._for_languages('shop section', lambda lang: self._send_shop_sections(lang, cacheds, actives))
 
-                    async with self.ClientSession() as session:
-                        request = await session.get(f'https://baydev.net/api/v1/fortnite-content?language={lang}')
-                        if request.status != 200:
-                            log.error(f'An error ocurred in updates_check task. API returned status {request.status}')
-                            return
-                        else:
-                            fortnitecontent = await request.json()
+        except:
+            log.error(f'Failed while checking shop section changes. Traceback:\n{traceback.format_exc()}')
 
-                    sections_data = fortnitecontent['data']['shopSections']['sectionList']['sections']
+    async def _send_shop_sections(self, lang: str, cacheds, actives):
 
-                    async with aiofiles.open(f'cache/shopsections/sections_{lang}.json', 'w', encoding='utf-8') as f:
-                        await f.write(json.dumps(sections_data))
+        start_timestamp = time.time()
 
-                    added = {}
-                    removed = {}
-                    notChanged = {}
+        response = await self.baydev.send_request('GET', '/v1/fortnite-content', parameters = {'language': lang})
 
-                    for section in cacheds:
-                        displayname = util.get_section_displayname(section, sections_data)
+        if response.status != 200:
+            log.error(f'An error ocurred in updates_check task. API returned status {response.status}')
+            return
+        else:
+            fortnitecontent = await response.json()
 
-                        if section in actives:
+        sections_data = fortnitecontent['data']['shopSections']['sectionList']['sections']
 
-                            if notChanged.get(displayname, None) == None:
-                                notChanged[displayname] = [displayname, 1]
-                            else:
-                                notChanged[displayname][1] += 1
+        async with aiofiles.open(f'cache/shopsections/sections_{lang}.json', 'w', encoding='utf-8') as f:
+            await f.write(json.dumps(sections_data))
 
-                        else:
+        util.shop_sections[lang] = SectionCatalog(lang, sections_data)
 
-                            if removed.get(section, None) == None:
-                                removed[displayname] = [displayname, 1]
-                            else:
-                                removed[displayname][1] += 1
+        added = {}
+        removed = {}
+        notChanged = {}
 
-                    for section in actives:
-                        displayname = util.get_section_displayname(section, sections_data)
+        for section in cacheds:
+            displayname = util.get_section_displayname(section, sections_data)
 
-                        if section not in cacheds:
+            if section in actives:
 
-                            if added.get(displayname, None) == None:
-                                added[displayname] = [displayname, 1]
-                            else:
-                                added[displayname][1] += 1
+                if notChanged.get(displayname, None) == None:
+                    notChanged[displayname] = [displayname, 1]
+                else:
+                    notChanged[displayname][1] += 1
 
-                    if len(added.keys()) == 0:
-                        added_string = '```\n```'
-                    else:
-                        added_string = '```diff\n'
-                        for section in list(added.keys()):
-                            added_string += f'+ {added[section][0]} x{added[section][1]}\n'
-                        added_string += '```'
+            else:
 
-                    if len(removed.keys()) == 0:
-                        removed_string = '```\n```'
-                    else:
-                        removed_string = '```\n'
-                        for section in list(removed.keys()):
-                            removed_string += f'- {removed[section][0]} x{removed[section][1]}\n'
-                        removed_string += '```'
+                if removed.get(section, None) == None:
+                    removed[displayname] = [displayname, 1]
+                else:
+                    removed[displayname][1] += 1
 
+        for section in actives:
+            displayname = util.get_section_displayname(section, sections_data)
 
-                    summary_string = '```diff\n'
+            if section not in cacheds:
 
-                    for section in list(added.keys()):
-                        summary_string += f'+ {added[section][0]} x{added[section][1]}\n'
+                if added.get(displayname, None) == None:
+                    added[displayname] = [displayname, 1]
+                else:
+                    added[displayname][1] += 1
 
-                    for section in list(removed.keys()):
-                        summary_string += f'- {removed[section][0]} x{removed[section][1]}\n'
+        if len(added.keys()) == 0:
+            added_string = '```\n```'
+        else:
+            added_string = '```diff\n'
+            for section in list(added.keys()):
+                added_string += f'+ {added[section][0]} x{added[section][1]}\n'
+            added_string += '```'
 
-                    for section in list(notChanged.keys()):
-                        summary_string += f'• {notChanged[section][0]} x{notChanged[section][1]}\n'
-                    
-                    summary_string += '```'
+        if len(removed.keys()) == 0:
+            removed_string = '```\n```'
+        else:
+            removed_string = '```\n'
+            for section in list(removed.keys()):
+                removed_string += f'- {removed[section][0]} x{removed[section][1]}\n'
+            removed_string += '```'
 
 
-                    embed = DiscordEmbed()
+        summary_string = '```diff\n'
 
-                    embed.color = util.Colors.BLURPLE
+        for section in list(added.keys()):
+            summary_string += f'+ {added[section][0]} x{added[section][1]}\n'
 
-                    embed.set_author(
-                        name = util.get_str(lang, 'update_message_string_shopsections_changes_detected')
-                    )
+        for section in list(removed.keys()):
+            summary_string += f'- {removed[section][0]} x{removed[section][1]}\n'
 
-                    embed.add_embed_field(
-                        name = util.get_str(lang, 'update_message_string_shopsections_added'),
-                        value = added_string,
-                        inline = True
-                    )
-                    embed.add_embed_field(
-                        name = util.get_str(lang, 'update_message_string_shopsections_removed'),
-                        value = removed_string,
-                        inline = True
-                    )
-                    embed.add_embed_field(
-                        name = util.get_str(lang, 'update_message_string_shopsections_summary'),
-                        value = summary_string,
-                        inline = False
-                    )
+        for section in list(notChanged.keys()):
+            summary_string += f'• {notChanged[section][0]} x{notChanged[section][1]}\n'
 
-                    embed.set_footer(
-                        text = util.get_str(lang, 'update_message_string_shopsections_footer')
-                    )
+        summary_string += '```'
 
-                    result = await self.updates_channel_send(embeds=[embed], type_='shopsections', lang=lang)
 
-                    log.debug(f'Sent {len(to_send_list)} embeds to {len(result)} guilds in {int((time.time() - start_timestamp))} seconds! - Status: {result}')
+        embed = DiscordEmbed()
 
-        except:
-            log.error(f'Failed while checking shop section changes. Traceback:\n{traceback.format_exc()}')
+        embed.color = util.Colors.BLURPLE
+
+        embed.set_author(
+            name = util.get_str(lang, 'update_message_string_shopsections_changes_detected')
+        )
+
+        embed.add_embed_field(
+            name = util.get_str(lang, 'update_message_string_shopsections_added'),
+            value = added_string,
+            inline = True
+        )
+        embed.add_embed_field(
+            name = util.get_str(lang, 'update_message_string_shopsections_removed'),
+            value = removed_string,
+            inline = True
+        )
+        embed.add_embed_field(
+            name = util.get_str(lang, 'update_message_string_shopsections_summary'),
+            value = summary_string,
+            inline = False
+        )
+
+        embed.set_footer(
+            text = util.get_str(lang, 'update_message_string_shopsections_footer')
+        )
+
+        result = await self.updates_channel_send(embeds=[embed], type_='shopsections', lang=lang)
+
+        log.debug(f'Sent 1 embeds to {len(result)} guilds in {int((time.time() - start_timestamp))} seconds! - Status: {result}')
 
 
     async def shop_channel_send(self, servers):
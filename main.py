@@ -5,12 +5,13 @@ import discord
 import asyncio
 import sys
 
-from modules import util
+from modules import util, api, metrics
 
 log = logging.getLogger('FortniteData')
 coloredlogs.install(level=None if util.debug == False else 'DEBUG')
 
 util.configuration = util.get_config()
+api.base_urls.update(util.configuration.get('base_urls', {}))
 
 bot = discord.Bot(
     intents = discord.Intents.default(),
@@ -39,6 +40,9 @@ def run():
 
     loop = asyncio.get_event_loop()
 
+    if util.configuration.get('metrics_port', None) != None: # prometheus scrape endpoint
+        loop.run_until_complete(metrics.start_server(util.configuration.get('metrics_host', '127.0.0.1'), util.configuration['metrics_port']))
+
     try:
         loop.run_until_complete(bot.start(util.configuration.get('bot_token')))
     except KeyboardInterrupt:
@@ -48,6 +52,8 @@ def run():
         log.critical(f'An error ocurred starting discord bot. Traceback:\n{traceback.format_exc()}')
         loop.run_until_complete(bot.close())
     finally:
+        loop.run_until_complete(api.close_session()) # pooled upstream connections
+        loop.run_until_complete(metrics.stop_server())
         loop.close()
         sys.exit()
 
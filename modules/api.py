@@ -1,34 +1,703 @@
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from contextvars import ContextVar
+from aiohttp.http_parser import HAS_BROTLI
 import aiofiles
+import hashlib
+import traceback
+import codecs
+import random
+import time
 import logging
+import asyncio
 import aiohttp
 import orjson
+import json
+import zlib
+import os
+
+from modules.cache import TTLCache
+from modules.assets import AssetCache
+from modules import snapshot, metrics
 
 log = logging.getLogger('FortniteData.modules.api')
 
+session = None # shared by every upstream call, keeps connections alive between requests
+
+def get_session():
+
+    global session
+
+    if session == None or session.closed:
+
+        session = aiohttp.ClientSession(
+            connector = aiohttp.TCPConnector(
+                limit = 100,
+                limit_per_host = 10,
+                ttl_dns_cache = 300,
+                keepalive_timeout = 60
+            ),
+            timeout = aiohttp.ClientTimeout(total = None, connect = 5, sock_read = 15) # a stalled upstream fails fast, big downloads still finish
+        )
+
+    return session
+
+async def close_session():
+
+    global session
+
+    if session != None and session.closed == False:
+        await session.close()
+
+    session = None
+
+async def load_validators(path: str):
+
+    # validators of a cached payload live next to it, path is the payload file
+    try:
+        async with aiofiles.open(f'{path}.meta', 'r', encoding='utf-8') as f:
+            return orjson.loads(await f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return {}
+
+async def save_validators(path: str, validators: dict):
+
+    async with aiofiles.open(f'{path}.meta', 'w', encoding='utf-8') as f:
+        await f.write(orjson.dumps(validators).decode())
+
+class SingleFlight:
+
+    def __init__(self):
+
+        self.calls = {} # key -> in flight future
+        self.coalesced = 0
+
+    async def run(self, key, factory):
+
+        # concurrent calls with the same key share the first one's result
+        future = self.calls.get(key, None)
+
+        if future == None:
+            future = asyncio.ensure_future(factory())
+            future.add_done_callback(lambda _: self.calls.pop(key, None))
+            self.calls[key] = future
+        else:
+            self.coalesced += 1
+
+        # a cancelled caller must not cancel the request the others are waiting for
+        return await asyncio.shield(future)
+
+inflight = SingleFlight()
+
+base_urls = {} # client name -> base url that replaces the real one, e.g. a local modules.fakeupstream
+
+class RateLimiter:
+
+    # token bucket per upstream host, background requests leave a reserve for commands
+    def __init__(self, rate: float, burst: int, reserve: float = 0.5):
+
+        self.rate = rate
+        self.burst = burst
+        self.reserve = burst * reserve
+
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0 # set from Retry-After
+
+        self.waiting = 0 # commands waiting for a token, background requests let them go first
+
+    def _refill(self):
+
+        now = time.monotonic()
+
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, background: bool = False):
+
+        if background == False:
+            self.waiting += 1
+
+        try:
+
+            while True:
+
+                now = time.monotonic()
+
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill()
+
+                floor = self.reserve if background else 0
+
+                if self.tokens - floor >= 1 and (background == False or self.waiting == 0):
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep(max((1 + floor - self.tokens) / self.rate, 0.05))
+
+        finally:
+
+            if background == False:
+                self.waiting -= 1
+
+# host -> (requests per second, burst), anything else gets the default
+RATE_LIMITS = {
+    'fortnite-api.com': (3, 10),
+    'baydev.net': (2, 5),
+    'fortnitecentral.genxgames.gg': (2, 5)
+}
+DEFAULT_RATE_LIMIT = (5, 10)
+
+limiters = {}
+
+def get_limiter(url: str):
+
+    host = urlsplit(url).hostname or ''
+
+    if host not in limiters:
+        limiters[host] = RateLimiter(*RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT))
+
+    return limiters[host]
+
+class CircuitBreaker:
+
+    # opens after threshold failures in a row, requests then fail fast until the cooldown
+    # lets one probe through, and that probe closes it again if it succeeds
+    def __init__(self, host: str, threshold: int = 5, cooldown: float = 30):
+
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self.state = 'closed' # closed, open or half_open
+        self.failures = 0
+        self.opened_at = 0
+        self.probing = False
+        self.trips = 0
+
+    def _set_state(self, state: str):
+
+        if state == 'closed':
+            log.info(f'Circuit for "{self.host}" closed, upstream is healthy again.')
+        elif state == 'open':
+            log.warning(f'Circuit for "{self.host}" opened after {self.failures} failures. Serving cached data for {self.cooldown} seconds.')
+
+        self.state = state
+
+    def allow(self):
+
+        # False while open, 'probe' for the one request let through half open, True otherwise
+        if self.state == 'closed':
+            return True
+
+        if self.state == 'open':
+
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+
+            self._set_state('half_open')
+
+        if self.probing: # only one probe at a time
+            return False
+
+        self.probing = True
+
+        return 'probe'
+
+    def success(self, probe: bool = False):
+
+        self.failures = 0
+
+        if probe: # a request let through before the circuit opened does not own the probe
+            self.probing = False
+
+        if self.state != 'closed':
+            self._set_state('closed')
+
+    def failure(self, probe: bool = False):
+
+        self.failures += 1
+
+        if probe:
+            self.probing = False
+
+        if self.state == 'half_open' or self.failures >= self.threshold:
+
+            self.opened_at = time.monotonic()
+
+            if self.state != 'open':
+                self.trips += 1
+                self._set_state('open')
+
+    def release(self, probe: bool = False):
+
+        if probe: # the probe was cancelled before an answer
+            self.probing = False
+
+    def status(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips
+        }
+
+breakers = {}
+
+def get_breaker(url: str):
+
+    host = urlsplit(url).hostname or ''
+
+    if host not in breakers:
+        breakers[host] = CircuitBreaker(host)
+
+    return breakers[host]
+
+def breaker_status():
+    return {host: breaker.status() for host, breaker in breakers.items()}
+
+background = ContextVar('background', default = False) # set by pollers, their requests yield to commands
+
+ACCEPT_ENCODING = 'gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate' # aiohttp decodes brotli only with the brotli package
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30 # longer Retry-After values are not waited, the error goes to the caller
+
+def retry_delay(attempt: int, headers = None):
+
+    # Retry-After is seconds or an http date, otherwise exponential backoff with full jitter
+    value = headers.get('Retry-After', None) if headers != None else None
+
+    if value != None:
+
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            pass
+
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+# endpoint -> (fresh seconds, stale seconds), stale responses are served while a refresh runs
+CACHE_TTLS = {
+    '/v2/news': (60, 600),
+    '/v2/aes': (60, 600),
+    '/v2/cosmetics/br/new': (120, 1800),
+    '/v2/creatorcode/search': (600, 3600)
+}
+
+# stats are cached by modules.stats, keyed by the normalized display name
+
+NEGATIVE_STATUSES = (403, 404) # unknown creator codes, private or unknown stats accounts
+NEGATIVE_TTL = 120
+
+response_cache = metrics.register_cache(TTLCache('responses', maxsize = 1024))
+default_assets = metrics.register_cache(AssetCache('assets', 'cache/assets')) # exported files, shared by every FortniteCentral
+background_tasks = set()
+
+# labelled by client name and endpoint path, parameters are left out to keep the series bounded
+request_seconds = metrics.registry.histogram('fortnitedata_upstream_request_seconds', 'Time until an upstream response was received, per attempt.', ('api', 'endpoint', 'method'), metrics.LATENCY_BUCKETS)
+response_bytes = metrics.registry.histogram('fortnitedata_upstream_response_bytes', 'Size of upstream response bodies.', ('api', 'endpoint'), metrics.SIZE_BUCKETS)
+responses_total = metrics.registry.counter('fortnitedata_upstream_responses_total', 'Upstream responses by status code.', ('api', 'endpoint', 'status'))
+errors_total = metrics.registry.counter('fortnitedata_upstream_errors_total', 'Upstream attempts that failed without a response.', ('api', 'endpoint', 'error'))
+retries_total = metrics.registry.counter('fortnitedata_upstream_retries_total', 'Upstream attempts that were retried.', ('api', 'endpoint'))
+cache_total = metrics.registry.counter('fortnitedata_response_cache_total', 'Response cache lookups by result.', ('api', 'endpoint', 'result'))
+circuit_open_total = metrics.registry.counter('fortnitedata_circuit_open_total', 'Requests answered locally because the circuit was open.', ('api', 'endpoint'))
+unchanged_total = metrics.registry.counter('fortnitedata_upstream_unchanged_total', 'Polls that found the payload unchanged, by 304 or by hash.', ('api', 'endpoint'))
+
+BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+@metrics.registry.collector
+def collect_metrics():
+    return [
+        ('fortnitedata_circuit_state', 'gauge', 'Circuit breaker state per host, 0 closed, 1 half open, 2 open.', ('host',), [((host,), BREAKER_STATES[breaker.state]) for host, breaker in breakers.items()]),
+        ('fortnitedata_circuit_trips_total', 'counter', 'Times the circuit of a host opened.', ('host',), [((host,), breaker.trips) for host, breaker in breakers.items()]),
+        ('fortnitedata_coalesced_requests_total', 'counter', 'Requests that shared an identical request in flight.', (), [((), inflight.coalesced)])
+    ]
+
+class Response:
+
+    # body is read while the connection is held, so the response stays usable after it is released
+    def __init__(self, status: int, headers: dict, content_type: str, body: bytes):
+
+        self.status = status
+        self.headers = headers
+        self.content_type = content_type
+        self.body = body
+
+        self._hash = None
+
+        self.circuit_open = False # answered locally, the upstream was not contacted
+
+    @property
+    def hash(self):
+
+        if self._hash == None:
+            self._hash = hashlib.sha256(self.body).hexdigest()
+
+        return self._hash
+
+    def validators(self):
+        return {
+            'etag': self.headers.get('ETag', None),
+            'last_modified': self.headers.get('Last-Modified', None),
+            'hash': self.hash
+        }
+
+    def not_modified(self, validators: dict):
+
+        # a 304, or a server without validators sending the same payload again
+        if self.status == 304:
+            return True
+
+        return self.status == 200 and validators.get('hash', None) != None and validators['hash'] == self.hash
+
+    async def read(self):
+        return self.body
+
+    async def text(self, encoding: str = 'utf-8'):
+        return self.body.decode(encoding, errors = 'replace')
+
+    async def json(self, loads = orjson.loads):
+        return loads(self.body)
+
+class StreamedResponse(Response):
+
+    # the body is never held whole, items() decodes it while it downloads
+    def __init__(self, request: aiohttp.ClientResponse, path: str = None):
+
+        super().__init__(
+            status = request.status,
+            headers = request.headers,
+            content_type = request.content_type,
+            body = None
+        )
+
+        self.request = request
+        self.size = 0 # bytes read so far
+        self.path = path # the body is teed to a compressed snapshot at path + ".tmp", save() moves it in place
+
+    @property
+    def hash(self):
+        return self._hash # known once items() finished
+
+    async def items(self, key: str = 'data', chunk_size: int = 65536):
+
+        # yields the items of the top level key array, every other value is skipped
+        decoder = json.JSONDecoder()
+        text = codecs.getincrementaldecoder('utf-8')()
+        digest = hashlib.sha256()
+
+        tee = None
+
+        if self.path != None:
+            tee = snapshot.Writer(f'{self.path}.tmp')
+            await tee.open()
+
+        buffer = ''
+        position = 0
+        state = 'object' # object -> key -> value -> key ... -> items -> key ... -> done
+        current = None
+        found = False
+
+        try:
+
+            async for chunk in self.request.content.iter_chunked(chunk_size):
+
+                digest.update(chunk)
+                self.size += len(chunk)
+
+                if tee != None:
+                    await tee.write(chunk)
+
+                if state == 'done': # the rest is only teed
+                    continue
+
+                buffer = buffer[position:] + text.decode(chunk)
+                position = 0
+
+                while state != 'done':
+
+                    # skip separators, what is left is a whole value or the start of one
+                    while position < len(buffer) and buffer[position] in ' \t\r\n,:':
+                        position += 1
+
+                    if position == len(buffer):
+                        break
+
+                    char = buffer[position]
+
+                    if state == 'object':
+                        position += 1 # opening brace
+                        state = 'key'
+                        continue
+
+                    if state == 'items' and char == ']':
+                        position += 1
+                        state = 'key' # the payload is only complete once the object closes
+                        continue
+
+                    if state == 'key' and char == '}':
+                        position += 1
+                        state = 'done'
+                        continue
+
+                    if state == 'value' and char == '[' and current == key:
+                        position += 1
+                        state = 'items'
+                        found = True
+                        continue
+
+                    try:
+                        value, end = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        break # the value continues in the next chunk
+
+                    if end == len(buffer) and not isinstance(value, (dict, list, str)):
+                        break # a number may continue in the next chunk too
+
+                    position = end
+
+                    if state == 'key':
+                        current = value
+                        state = 'value'
+                    elif state == 'value':
+                        state = 'key'
+                    else:
+                        yield value
+
+            if state != 'done' or found == False:
+                raise ValueError(f'Truncated payload or no "{key}" array in it')
+
+            self._hash = digest.hexdigest()
+
+            if tee != None:
+                await tee.close(self._hash)
+                tee = None
+
+        except BaseException:
+
+            if tee != None:
+                await tee.close()
+                os.remove(f'{self.path}.tmp')
+                tee = None
+
+            raise
+
+        finally:
+
+            if tee != None:
+                await tee.close()
+
+    async def download(self, path: str, chunk_size: int = 65536):
+
+        # writes the raw body to path a chunk at a time, returns its size
+        digest = hashlib.sha256()
+
+        try:
+
+            async with aiofiles.open(path, 'wb') as f:
+                async for chunk in self.request.content.iter_chunked(chunk_size):
+                    digest.update(chunk)
+                    self.size += len(chunk)
+                    await f.write(chunk)
+
+        except BaseException:
+
+            if os.path.exists(path):
+                os.remove(path)
+
+            raise
+
+        self._hash = digest.hexdigest()
+
+        return self.size
+
+    async def save(self):
+
+        # the cached payload is replaced in one step, readers never see a partial file
+        os.replace(f'{self.path}.tmp', self.path)
+
+        await save_validators(self.path, self.validators())
+
+    def discard(self):
+
+        if self.path != None and os.path.exists(f'{self.path}.tmp'):
+            os.remove(f'{self.path}.tmp')
+
 class API:
 
     def __init__(self, name: str, base_url: str, authorization: str = None):
 
         self.name = name
-        self.base_url = base_url
+        self.base_url = base_urls.get(name, base_url)
         self.authorization = authorization
 
-        self.client = None
-
     async def send_request(
         self,
         method: str,
         endpoint: str,
         parameters: dict = None,
-        headers: dict = {},
+        headers: dict = None,
         body: dict = None,
+        validators: dict = None,
+        snapshot: str = None,
+        cache: bool = True
     ):
 
+        # snapshot is a cached copy of the body on disk, served while the upstream circuit is open
+        # cache = False always asks the upstream, the answer still refreshes the cache for commands
         log.debug(f'[{self.name}] Sending {method} request to "{endpoint}"')
 
-        if self.client == None:
-            self.client = aiohttp.ClientSession()
+        final_url, headers = self._prepare(endpoint, parameters, headers, validators)
+
+        if method == 'GET' and body == None: # identical reads share one round trip
+
+            key = (final_url, tuple(sorted(headers.items())))
+
+            if endpoint in CACHE_TTLS and validators == None and cache:
+                response = await self._cached_request(key, endpoint, final_url, headers)
+            elif endpoint in CACHE_TTLS and validators == None:
+                response = await self._revalidate(key, endpoint, final_url, headers)
+            else:
+                response = await inflight.run(key, lambda: self._request(method, endpoint, final_url, headers, body))
+
+        else:
+            response = await self._request(method, endpoint, final_url, headers, body)
+
+        if response.circuit_open and snapshot != None:
+            response = await self._read_snapshot(snapshot) or response
+
+        return response
+
+    async def _read_snapshot(self, path: str):
+
+        try:
+            body = await snapshot.read(path)
+        except FileNotFoundError:
+            return None
+        except (snapshot.SnapshotError, zlib.error):
+            log.error(f'[{self.name}] Snapshot "{path}" is corrupted.')
+            return None
+
+        log.debug(f'[{self.name}] Serving snapshot "{path}".')
+
+        response = Response(status = 200, headers = {}, content_type = 'application/json', body = body)
+        response.circuit_open = True
+
+        return response
+
+    def _circuit_open(self, final_url: str):
+
+        log.debug(f'[{self.name}] Circuit open, not sending request to "{final_url}".')
+
+        response = Response(status = 503, headers = {}, content_type = None, body = b'')
+        response.circuit_open = True
+
+        return response
+
+    def _unreachable(self, final_url: str, error: BaseException):
+
+        # the last retry failed too, answered like an open circuit so callers get the snapshot or a stale entry
+        log.error(f'[{self.name}] Unable to reach "{final_url}": {error!r}')
+
+        response = Response(status = 503, headers = {}, content_type = None, body = b'')
+        response.circuit_open = True
+
+        return response
+
+    @asynccontextmanager
+    async def stream_request(self, endpoint: str, parameters: dict = None, validators: dict = None, path: str = None):
+
+        # for big payloads, never coalesced or cached since the body is consumed once
+        log.debug(f'[{self.name}] Sending streamed GET request to "{endpoint}"')
+
+        final_url, headers = self._prepare(endpoint, parameters, None, validators)
+
+        limiter = get_limiter(final_url)
+        breaker = get_breaker(final_url)
+
+        for attempt in range(MAX_RETRIES + 1):
+
+            allowed = breaker.allow()
+
+            if allowed == False:
+                circuit_open_total.inc(self.name, endpoint)
+                yield self._circuit_open(final_url)
+                return
+
+            probe = allowed == 'probe'
+
+            try:
+                await limiter.acquire(background.get())
+                start = time.perf_counter()
+                request = await get_session().get(final_url, headers = headers)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+
+                breaker.failure(probe)
+                errors_total.inc(self.name, endpoint, 'timeout' if isinstance(error, asyncio.TimeoutError) else 'connection')
+
+                if attempt == MAX_RETRIES:
+                    yield self._unreachable(final_url, error)
+                    return
+
+                delay = retry_delay(attempt)
+
+            except BaseException:
+                breaker.release(probe)
+                raise
+
+            else:
+
+                log.debug(f'[{self.name}] Request sent, received status {request.status}.')
+
+                request_seconds.observe(time.perf_counter() - start, self.name, endpoint, 'GET') # until the headers, the body is read by the caller
+                responses_total.inc(self.name, endpoint, str(request.status))
+
+                if request.status >= 500:
+                    breaker.failure(probe)
+                else:
+                    breaker.success(probe)
+
+                if request.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    break
+
+                delay = self._retry_delay(limiter, attempt, request.status, request.headers)
+
+                if delay == None: # the caller gets the error response
+                    break
+
+                request.release()
+
+            retries_total.inc(self.name, endpoint)
+            log.warning(f'[{self.name}] "{endpoint}" failed, retrying in {delay:.2f} seconds ({attempt + 1}/{MAX_RETRIES}).')
+            await asyncio.sleep(delay)
+
+        response = StreamedResponse(request, path)
+
+        try:
+            yield response
+        finally:
+            response_bytes.observe(response.size, self.name, endpoint)
+            request.release()
+            response.discard() # nothing left behind unless save() was called
+
+    def _prepare(self, endpoint: str, parameters: dict, headers: dict, validators: dict):
+
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', ACCEPT_ENCODING)
 
         final_url = f'{self.base_url}{endpoint}'
 
@@ -38,21 +707,154 @@ class API:
         if self.authorization != None:
             headers['Authorization'] = self.authorization
 
-        async with self.client.request(
-            method = method,
-            url = final_url,
-            body = body,
-            headers = headers
-        ) as request:
+        if validators != None: # conditional request, the server answers 304 if nothing changed
+
+            if validators.get('etag', None) != None:
+                headers['If-None-Match'] = validators['etag']
+
+            if validators.get('last_modified', None) != None:
+                headers['If-Modified-Since'] = validators['last_modified']
+
+        return final_url, headers
+
+    async def _cached_request(self, key: tuple, endpoint: str, final_url: str, headers: dict):
+
+        response, stale = response_cache.lookup(key)
+
+        cache_total.inc(self.name, endpoint, 'miss' if response == None else 'stale' if stale else 'hit')
+
+        if response != None:
+
+            if stale and key not in inflight.calls:
+                log.debug(f'[{self.name}] Serving stale "{endpoint}", refreshing in background.')
+                task = asyncio.ensure_future(self._refresh(key, endpoint, final_url, headers))
+                background_tasks.add(task) # the loop only keeps weak references to tasks
+                task.add_done_callback(background_tasks.discard)
+
+            return response
+
+        response = await self._revalidate(key, endpoint, final_url, headers)
+
+        if response.circuit_open: # an expired answer beats none while the upstream is down
+            return response_cache.peek(key) or response
+
+        return response
+
+    async def _refresh(self, key: tuple, endpoint: str, final_url: str, headers: dict):
+
+        try:
+            await self._revalidate(key, endpoint, final_url, headers)
+        except Exception:
+            log.error(f'[{self.name}] Failed to refresh "{endpoint}" in background. Traceback:\n{traceback.format_exc()}')
+
+    async def _revalidate(self, key: tuple, endpoint: str, final_url: str, headers: dict):
+
+        response = await inflight.run(key, lambda: self._request('GET', endpoint, final_url, headers, None))
+
+        fresh, stale = CACHE_TTLS[endpoint]
+
+        if response.status == 200:
+            response_cache.set(key, response, fresh, stale)
+        elif response.status in NEGATIVE_STATUSES:
+            response_cache.set(key, response, NEGATIVE_TTL)
+
+        # anything else keeps the previous entry, a stale answer beats an error
+
+        return response
+
+    def _retry_delay(self, limiter: RateLimiter, attempt: int, status: int, headers):
+
+        # None when the server asks for a longer wait than a command should take
+        delay = retry_delay(attempt, headers)
+
+        if status == 429:
+            limiter.pause(min(delay, BACKOFF_MAX)) # every request to this host waits, not only this one
+
+        if delay > BACKOFF_MAX:
+            log.error(f'[{self.name}] Upstream asked to wait {delay:.0f} seconds, not retrying.')
+            return None
+
+        return delay
+
+    async def _request(self, method: str, endpoint: str, final_url: str, headers: dict, body: dict):
+
+        limiter = get_limiter(final_url)
+        breaker = get_breaker(final_url)
+        retries = MAX_RETRIES if method in ('GET', 'HEAD') else 0 # only idempotent requests are repeated
+
+        for attempt in range(retries + 1):
+
+            allowed = breaker.allow()
 
-            log.debug(f'[{self.name}] Request sent, received status {request.status}.')
+            if allowed == False:
+                circuit_open_total.inc(self.name, endpoint)
+                return self._circuit_open(final_url)
 
-            return request
+            probe = allowed == 'probe'
+
+            try:
+
+                await limiter.acquire(background.get())
+
+                start = time.perf_counter() # the rate limiter wait is not upstream latency
+
+                async with get_session().request(
+                    method = method,
+                    url = final_url,
+                    json = body,
+                    headers = headers
+                ) as request:
+
+                    log.debug(f'[{self.name}] Request sent, received status {request.status}.')
+
+                    response = Response(
+                        status = request.status,
+                        headers = request.headers,
+                        content_type = request.content_type,
+                        body = await request.read()
+                    )
+
+                request_seconds.observe(time.perf_counter() - start, self.name, endpoint, method)
+                response_bytes.observe(len(response.body), self.name, endpoint)
+                responses_total.inc(self.name, endpoint, str(response.status))
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+
+                breaker.failure(probe)
+                errors_total.inc(self.name, endpoint, 'timeout' if isinstance(error, asyncio.TimeoutError) else 'connection')
+
+                if attempt == retries:
+                    return self._unreachable(final_url, error)
+
+                delay = retry_delay(attempt)
+
+            except BaseException:
+                breaker.release(probe)
+                raise
+
+            else:
+
+                if response.status >= 500: # 429 is rate limiting, not an unhealthy upstream
+                    breaker.failure(probe)
+                else:
+                    breaker.success(probe)
+
+                if response.status not in RETRY_STATUSES or attempt == retries:
+                    return response
+
+                delay = self._retry_delay(limiter, attempt, response.status, response.headers)
+
+                if delay == None:
+                    return response
+
+            retries_total.inc(self.name, endpoint)
+            log.warning(f'[{self.name}] Request to "{final_url}" failed, retrying in {delay:.2f} seconds ({attempt + 1}/{retries}).')
+            await asyncio.sleep(delay)
 
 class FortniteAPI(API):
 
     def __init__(self, api_key: str):
-        super().__ini__(
+        super().__init__(
             name = 'Fortnite-API',
             base_url = 'https://fortnite-api.com',
             authorization = api_key
@@ -81,8 +883,7 @@ class FortniteAPI(API):
                 log.info(f'[{self.name}] Trying to use cached data...')
 
                 try:
-                    async with aiofiles.open(f'cache/cosmetics/all_{language}.json', 'r', encoding='utf-8') as f:
-                        return orjson.loads(await f.read())
+                    return await snapshot.read_json(f'cache/cosmetics/all_{language}.json')
                 except:
                     log.error(f'[{self.name}] Unable to load cached data.')
                     return None
@@ -91,9 +892,10 @@ class FortniteAPI(API):
 
             data = await response.json(loads=orjson.loads)
 
-            async with aiofiles.open(f'cache/cosmetics/all_{language}.json', 'w', encoding='utf-8') as f:
-                await f.write(orjson.dumps(data).decode())
-                log.debug(f'[{self.name}] updated local cosmetics cache.')
+            await snapshot.write(f'cache/cosmetics/all_{language}.json', response.body)
+            log.debug(f'[{self.name}] updated local cosmetics cache.')
+
+            await save_validators(f'cache/cosmetics/all_{language}.json', response.validators())
 
             return data
 
@@ -115,8 +917,7 @@ class FortniteAPI(API):
                 log.info(f'[{self.name}] Trying to use cached data...')
 
                 try:
-                    async with aiofiles.open(f'cache/playlists/{language}.json', 'r', encoding='utf-8') as f:
-                        return orjson.loads(await f.read())
+                    return await snapshot.read_json(f'cache/playlists/{language}.json')
                 except:
                     log.error(f'[{self.name}] Unable to load cached data.')
                     return None
@@ -125,9 +926,10 @@ class FortniteAPI(API):
 
             data = await response.json(loads=orjson.loads)
 
-            async with aiofiles.open(f'cache/playlists/{language}.json', 'w', encoding='utf-8') as f:
-                await f.write(orjson.dumps(data).decode())
-                log.debug(f'[{self.name}] updated local playlists cache.')
+            await snapshot.write(f'cache/playlists/{language}.json', response.body)
+            log.debug(f'[{self.name}] updated local playlists cache.')
+
+            await save_validators(f'cache/playlists/{language}.json', response.validators())
 
             return data
 
@@ -286,12 +1088,14 @@ class BaydevAPI(API):
 
 class FortniteCentral(API):
 
-    def __init__(self):
+    def __init__(self, asset_cache: AssetCache = None):
         super().__init__(
             name = 'FortniteCentral',
             base_url = 'https://fortnitecentral.genxgames.gg'
         )
 
+        self.assets = asset_cache if asset_cache != None else default_assets
+
     async def fetch_assets(self):
 
         response = await self.send_request(
@@ -310,22 +1114,38 @@ class FortniteCentral(API):
     async def export_asset(
         self,
         path: str,
+        version: str,
         raw: bool = True
     ):
 
-        response = await self.send_request(
-            method = 'GET',
+        # returns (file path, content type) of the exported asset in the local asset cache
+        key = AssetCache.key(path, version, raw)
+
+        cached = await self.assets.get(key)
+
+        if cached != None:
+            log.debug(f'[{self.name}] Serving "{path}" from the asset cache.')
+            return cached
+
+        return await inflight.run(('export', key), lambda: self._export_asset(key, path, raw))
+
+    async def _export_asset(self, key: str, path: str, raw: bool):
+
+        await self.assets.load()
+
+        async with self.stream_request(
             endpoint = '/api/v1/export',
             parameters = {
                 'path': path,
                 'raw': raw
             }
-        )
+        ) as response:
 
-        if response.status != 200:
-            log.error(f'[{self.name}] Unable to export asset.')
-            return None
+            if response.status != 200:
+                log.error(f'[{self.name}] Unable to export asset.')
+                return None
 
-        else:
+            temp_path = self.assets.temp_path()
+            size = await response.download(temp_path)
 
-            return response.read(), response.content_type
+        return await self.assets.add(key, temp_path, response.hash, size, response.content_type)
@@ -0,0 +1,180 @@
+from collections import OrderedDict
+import aiofiles
+import logging
+import asyncio
+import orjson
+import os
+
+log = logging.getLogger('FortniteData.modules.assets')
+
+class AssetCache:
+
+    # exported assets on disk, files are named by the sha256 of their content so
+    # the same asset in several game versions is only stored once
+    def __init__(self, name: str, directory: str, max_bytes: int = 512 * 1024 * 1024):
+
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.entries = OrderedDict() # key -> (digest, content type), least recently used first
+        self.refs = {} # digest -> number of keys pointing at it
+        self.sizes = {} # digest -> file size
+        self.size = 0
+
+        self.loaded = False
+        self.lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(path: str, version: str, raw: bool = True):
+        return f'{version}:{int(raw)}:{path}'
+
+    def blob_path(self, digest: str):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def temp_path(self):
+        return os.path.join(self.directory, f'{os.urandom(8).hex()}.tmp')
+
+    async def load(self):
+
+        async with self.lock:
+
+            if self.loaded:
+                return
+
+            os.makedirs(self.directory, exist_ok = True)
+
+            try:
+                async with aiofiles.open(os.path.join(self.directory, 'index.json'), 'rb') as f:
+                    index = orjson.loads(await f.read())
+            except (FileNotFoundError, orjson.JSONDecodeError):
+                index = {'entries': [], 'sizes': {}}
+
+            for key, digest, content_type in index['entries']:
+                if digest in index['sizes'] and os.path.exists(self.blob_path(digest)): # files removed by hand are forgotten
+                    self._link(key, digest, content_type, index['sizes'][digest])
+
+            # downloads interrupted by a restart
+            for name in os.listdir(self.directory):
+                if name.endswith('.tmp'):
+                    os.remove(os.path.join(self.directory, name))
+
+            self.loaded = True
+
+            log.debug(f'[{self.name}] Loaded {len(self.entries)} assets, {self.size} bytes.')
+
+    async def _save(self):
+
+        index = {
+            'entries': [[key, digest, content_type] for key, (digest, content_type) in self.entries.items()],
+            'sizes': self.sizes
+        }
+
+        path = os.path.join(self.directory, 'index.json')
+
+        async with aiofiles.open(f'{path}.tmp', 'wb') as f:
+            await f.write(orjson.dumps(index))
+
+        os.replace(f'{path}.tmp', path)
+
+    def _link(self, key: str, digest: str, content_type: str, size: int):
+
+        self.entries[key] = (digest, content_type)
+
+        if digest not in self.refs:
+            self.refs[digest] = 0
+            self.sizes[digest] = size
+            self.size += size
+
+        self.refs[digest] += 1
+
+    def _unlink(self, key: str):
+
+        digest, _ = self.entries.pop(key)
+
+        self.refs[digest] -= 1
+
+        if self.refs[digest] == 0: # last key using this content
+
+            del self.refs[digest]
+            self.size -= self.sizes.pop(digest)
+
+            try:
+                os.remove(self.blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str):
+
+        # returns (file path, content type) or None
+        await self.load()
+
+        async with self.lock:
+
+            entry = self.entries.get(key, None)
+
+            if entry == None or os.path.exists(self.blob_path(entry[0])) == False:
+
+                if entry != None:
+                    self._unlink(key)
+
+                self.misses += 1
+                return None
+
+            # recency only lives in memory, the index is written on add and eviction
+            # and a restart before that loses nothing but the order of recent hits
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return self.blob_path(entry[0]), entry[1]
+
+    async def add(self, key: str, temp_path: str, digest: str, size: int, content_type: str):
+
+        # temp_path is a finished download, it is moved in place or dropped if the content is already stored
+        await self.load()
+
+        async with self.lock:
+
+            path = self.blob_path(digest)
+
+            if key in self.entries:
+                self._unlink(key)
+
+            if digest in self.refs:
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok = True)
+                os.replace(temp_path, path)
+
+            self._link(key, digest, content_type, size)
+
+            # the asset just added is kept even when it is bigger than the whole cache
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                self._unlink(next(iter(self.entries)))
+                self.evictions += 1
+
+            await self._save()
+
+            return path, content_type
+
+    def stats(self):
+
+        total = self.hits + self.misses
+
+        return {
+            'name': self.name,
+            'size': len(self.entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total != 0 else 0.0
+        }
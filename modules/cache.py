@@ -0,0 +1,157 @@
+from collections import OrderedDict
+import logging
+import time
+
+log = logging.getLogger('FortniteData.modules.cache')
+
+class LRUCache:
+
+    def __init__(self, name: str, maxsize: int = 1024, maxweight: int = None, weigh = None):
+
+        self.name = name
+        self.maxsize = maxsize
+
+        # optional bound on the summed weigh(value), for values that vary a lot in size
+        self.maxweight = maxweight
+        self.weigh = weigh
+        self.weight = 0
+
+        self.data = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default = None):
+
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.data.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def _weight(self, value):
+        return self.weigh(value) if self.weigh != None else 0
+
+    def set(self, key, value):
+
+        weight = self._weight(value)
+
+        if self.maxweight != None and weight > self.maxweight: # would push out everything else
+            self.pop(key)
+            return
+
+        self.pop(key)
+
+        self.data[key] = value
+        self.weight += weight
+
+        while len(self.data) > self.maxsize or (self.maxweight != None and self.weight > self.maxweight):
+            _, evicted = self.data.popitem(last = False)
+            self.weight -= self._weight(evicted)
+            self.evictions += 1
+
+    def pop(self, key, default = None):
+
+        if key not in self.data:
+            return default
+
+        value = self.data.pop(key)
+        self.weight -= self._weight(value)
+
+        return value
+
+    def prune(self, predicate):
+
+        # drops every entry whose key matches, returns how many
+        keys = [key for key in self.data if predicate(key)]
+
+        for key in keys:
+            self.pop(key)
+
+        return len(keys)
+
+    def clear(self):
+        self.data.clear()
+        self.weight = 0
+
+    def stats(self):
+
+        total = self.hits + self.misses
+
+        return {
+            'name': self.name,
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+            'weight': self.weight,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total != 0 else 0.0
+        }
+
+class TTLCache(LRUCache):
+
+    # entries expire after ttl seconds and can still be served as stale for another stale seconds
+    def __init__(self, name: str, maxsize: int = 1024):
+
+        super().__init__(name, maxsize)
+
+        self.stale_hits = 0
+
+    def set(self, key, value, ttl: float, stale: float = 0):
+
+        now = time.monotonic()
+
+        super().set(key, (value, now + ttl, now + ttl + stale))
+
+    def lookup(self, key):
+
+        # returns (value, stale), value is None on a miss
+        entry = self.data.get(key, None)
+
+        if entry == None:
+            self.misses += 1
+            return None, False
+
+        value, expires, stale_until = entry
+        now = time.monotonic()
+
+        if now >= stale_until: # kept until evicted, peek() can still fall back to it
+            self.misses += 1
+            return None, False
+
+        self.data.move_to_end(key)
+
+        if now >= expires:
+            self.stale_hits += 1
+            return value, True
+
+        self.hits += 1
+
+        return value, False
+
+    def peek(self, key):
+
+        # any age, for when there is nothing better to serve
+        entry = self.data.get(key, None)
+
+        return entry[0] if entry != None else None
+
+    def stats(self):
+
+        stats = super().stats()
+        stats['stale_hits'] = self.stale_hits
+
+        return stats
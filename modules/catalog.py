@@ -0,0 +1,754 @@
+from modules.search import PrefixIndex, TrigramIndex, FuzzyIndex, normalize
+from collections.abc import Sequence
+from bisect import bisect_left, insort
+import numpy as np
+import itertools
+import logging
+
+log = logging.getLogger('FortniteData.modules.catalog')
+
+versions = itertools.count(1) # every catalog build gets a new version, cached searches compare it
+
+ID_PREFIXES = ('cid_', 'bid_', 'pickaxe_', 'eid_', 'musicpack_', 'spid_', 'lsid_', 'wrap_', 'glider_', 'bannertoken_')
+
+def is_cosmetic_id(query: str):
+    return normalize(query).startswith(ID_PREFIXES)
+
+# (key, subkey) of every string that changes between languages, everything else is shared
+LOCALIZED_FIELDS = (
+    ('name', None),
+    ('description', None),
+    ('customExclusiveCallout', None),
+    ('unlockRequirements', None),
+    ('type', 'displayValue'),
+    ('rarity', 'displayValue'),
+    ('series', 'value'),
+    ('set', 'value'),
+    ('set', 'text'),
+    ('introduction', 'text')
+)
+
+def split_localized(cosmetic: dict):
+
+    neutral = dict(cosmetic)
+    strings = []
+
+    for key, subkey in LOCALIZED_FIELDS:
+
+        if subkey == None:
+            strings.append(neutral.get(key, None))
+            if key in neutral:
+                neutral[key] = None
+            continue
+
+        parent = neutral.get(key, None)
+
+        if not isinstance(parent, dict) or subkey not in parent:
+            strings.append(None)
+            continue
+
+        if parent is cosmetic[key]: # copy on write, never touch the source dict
+            parent = neutral[key] = dict(parent)
+
+        strings.append(parent[subkey])
+        parent[subkey] = None
+
+    variants = cosmetic.get('variants', None)
+
+    if variants: # channel types and option names are translated too
+        neutral['variants'] = [dict(variant, type = None, options = [dict(option, name = None) for option in variant.get('options') or []]) for variant in variants]
+        strings.append(tuple((variant.get('type', None), tuple(option.get('name', None) for option in variant.get('options') or [])) for variant in variants))
+    else:
+        strings.append(None)
+
+    return neutral, tuple(strings)
+
+def localize(neutral: dict, strings: tuple):
+
+    cosmetic = dict(neutral)
+
+    for (key, subkey), value in zip(LOCALIZED_FIELDS, strings):
+
+        if subkey == None:
+            if key in cosmetic:
+                cosmetic[key] = value
+            continue
+
+        parent = cosmetic.get(key, None)
+
+        if not isinstance(parent, dict) or subkey not in parent:
+            continue
+
+        if parent is neutral[key]:
+            parent = cosmetic[key] = dict(parent)
+
+        parent[subkey] = value
+
+    variants = strings[len(LOCALIZED_FIELDS)]
+
+    if variants != None:
+        cosmetic['variants'] = [
+            dict(variant, type = channel, options = [dict(option, name = name) for option, name in zip(variant['options'], names)])
+            for variant, (channel, names) in zip(neutral['variants'], variants)
+        ]
+
+    return cosmetic
+
+class CosmeticStore:
+
+    def __init__(self):
+
+        self.catalogs = {} # language -> live catalog
+
+    def attach(self, catalog):
+        self.catalogs[catalog.language] = catalog
+
+    def intern(self, cosmetic_id: str, neutral: dict):
+
+        # reuse the neutral record of any live catalog, the old catalog of the same language included
+        for catalog in self.catalogs.values():
+
+            shared = catalog.get_neutral(cosmetic_id)
+
+            if shared == None:
+                continue
+
+            if shared is neutral or shared == neutral:
+                return shared
+
+        return neutral
+
+class Results(Sequence):
+
+    # search result cursor, records are only built when someone reads them
+    def __init__(self, catalog, handles: list):
+        self.catalog = catalog
+        self.handles = handles
+
+    def __len__(self):
+        return len(self.handles)
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return Results(self.catalog, self.handles[index])
+
+        return self.catalog.record(self.handles[index])
+
+class Catalog:
+
+    def _build_indexes(self, name_keys: list, id_keys: list):
+
+        self.version = next(versions)
+
+        # normalized once per load, searches never lowercase records again
+        self.name_keys = name_keys
+        self.id_keys = id_keys
+
+        self.name_index = PrefixIndex(self.name_keys)
+        self.id_index = PrefixIndex(self.id_keys)
+
+        self.name_trigrams = TrigramIndex(self.name_keys)
+        self.id_trigrams = TrigramIndex(self.id_keys)
+
+    def search_starts(self, query: str, by_id: bool = False):
+
+        index = self.id_index if by_id else self.name_index
+
+        return sorted(index.search(query)) # back to api order
+
+    def search_contains(self, query: str, by_id: bool = False):
+
+        index = self.id_trigrams if by_id else self.name_trigrams
+
+        return index.search(query)
+
+    def suggest(self, query: str, by_id: bool = False, limit: int = 25, deadline: float = None):
+
+        # bounded work for autocomplete, prefix matches first and then substring matches until the deadline
+        if by_id:
+            keys, prefix, trigrams = self.id_keys, self.id_index, self.id_trigrams
+        else:
+            keys, prefix, trigrams = self.name_keys, self.name_index, self.name_trigrams
+
+        results = []
+        seen = set()
+
+        searches = (
+            lambda: prefix.search(query, limit = limit),
+            lambda: trigrams.search(query, limit = limit, deadline = deadline) # only when the prefixes were not enough
+        )
+
+        for search in searches:
+
+            for handle in search():
+
+                if keys[handle] in seen:
+                    continue
+
+                seen.add(keys[handle])
+                results.append(handle)
+
+                if len(results) >= limit:
+                    return results
+
+        return results
+
+def _nested(record: dict, key: str, subkey: str):
+
+    parent = record.get(key, None)
+
+    if not isinstance(parent, dict):
+        return None
+
+    return parent.get(subkey, None)
+
+def _number(value):
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+class CosmeticColumns:
+
+    # categorical column -> (key, subkey) of the neutral record holding its value
+    CATEGORIES = {
+        'type': ('type', 'value'),
+        'rarity': ('rarity', 'value'),
+        'series': ('series', 'backendValue'),
+        'set': ('set', 'backendValue')
+    }
+
+    # categorical column -> localized display name, users search sets and series by name
+    ALIASES = {
+        'series': LOCALIZED_FIELDS.index(('series', 'value')),
+        'set': LOCALIZED_FIELDS.index(('set', 'value'))
+    }
+
+    def __init__(self, catalog):
+
+        size = len(catalog)
+
+        self.size = size
+        self.vocabulary = {} # column -> normalized value -> code, 0 is always "none"
+        self.aliases = {} # column -> normalized display name -> code
+        self.codes = {}
+
+        for column, (key, subkey) in self.CATEGORIES.items():
+
+            vocabulary = {'': 0}
+            codes = [vocabulary.setdefault(normalize(_nested(neutral, key, subkey)), len(vocabulary)) for neutral in catalog.neutral]
+
+            self.vocabulary[column] = vocabulary
+            self.codes[column] = np.array(codes, dtype=np.int32)
+
+        for column, field in self.ALIASES.items():
+
+            aliases = {}
+
+            for handle, strings in enumerate(catalog.strings):
+                if strings[field]:
+                    aliases.setdefault(normalize(strings[field]), int(self.codes[column][handle]))
+
+            self.aliases[column] = aliases
+
+        self.chapter = np.fromiter((_number(_nested(neutral, 'introduction', 'chapter')) for neutral in catalog.neutral), dtype=np.int16, count=size)
+        self.season = np.fromiter((_number(_nested(neutral, 'introduction', 'season')) for neutral in catalog.neutral), dtype=np.int16, count=size)
+
+    def patch(self, catalog, handles: list):
+
+        # new columns for a patched catalog, only the touched handles are recomputed
+        columns = CosmeticColumns.__new__(CosmeticColumns)
+
+        size = len(catalog)
+
+        columns.size = size
+        columns.vocabulary = {column: dict(vocabulary) for column, vocabulary in self.vocabulary.items()}
+        columns.aliases = {column: dict(aliases) for column, aliases in self.aliases.items()}
+        columns.codes = {}
+
+        for column, (key, subkey) in self.CATEGORIES.items():
+
+            vocabulary = columns.vocabulary[column]
+
+            codes = np.zeros(size, dtype=np.int32)
+            codes[:self.size] = self.codes[column]
+
+            for handle in handles:
+                codes[handle] = vocabulary.setdefault(normalize(_nested(catalog.neutral[handle], key, subkey)), len(vocabulary))
+
+            columns.codes[column] = codes
+
+        for column, field in self.ALIASES.items():
+
+            aliases = columns.aliases[column]
+
+            for handle in handles:
+                strings = catalog.strings[handle]
+                if strings[field]:
+                    aliases.setdefault(normalize(strings[field]), int(columns.codes[column][handle]))
+
+        columns.chapter = np.zeros(size, dtype=np.int16)
+        columns.chapter[:self.size] = self.chapter
+
+        columns.season = np.zeros(size, dtype=np.int16)
+        columns.season[:self.size] = self.season
+
+        for handle in handles:
+            columns.chapter[handle] = _number(_nested(catalog.neutral[handle], 'introduction', 'chapter'))
+            columns.season[handle] = _number(_nested(catalog.neutral[handle], 'introduction', 'season'))
+
+        return columns
+
+    def lookup(self, column: str, value: str):
+
+        value = normalize(value).strip()
+
+        vocabulary = self.vocabulary[column]
+        aliases = self.aliases.get(column, {})
+
+        if value in vocabulary:
+            return [vocabulary[value]]
+
+        if value in aliases:
+            return [aliases[value]]
+
+        # nothing exact, every value or display name containing the text
+        codes = {code for name, code in itertools.chain(vocabulary.items(), aliases.items()) if name and value in name}
+
+        return sorted(codes)
+
+    def mask(self, **filters):
+
+        mask = np.ones(self.size, dtype=bool)
+
+        for column in self.CATEGORIES:
+
+            values = filters.get(column, None)
+
+            if values == None:
+                continue
+
+            if isinstance(values, str):
+                values = [values]
+
+            codes = []
+            for value in values:
+                codes.extend(self.lookup(column, value))
+
+            mask &= np.isin(self.codes[column], codes)
+
+        if filters.get('chapter', None) != None:
+            mask &= self.chapter == filters['chapter']
+
+        if filters.get('season', None) != None:
+            mask &= self.season == filters['season']
+
+        return mask
+
+class CosmeticCatalog(Catalog):
+
+    def __init__(self, language: str, cosmetics: list = None, store: CosmeticStore = None):
+
+        self.language = language
+        self.store = store
+
+        self.neutral = [] # handle -> language neutral record, shared between languages
+        self.strings = [] # handle -> localized strings of this language
+        self.handles = {} # cosmetic id -> handle, keeps api order
+        self.types = {} # type value -> list of handles
+
+        if cosmetics != None:
+            for cosmetic in cosmetics:
+                self._add(cosmetic)
+
+        self._finish()
+
+    def _finish(self):
+
+        self._build_indexes(
+            name_keys = [normalize(strings[0]) for strings in self.strings],
+            id_keys = [normalize(neutral['id']) for neutral in self.neutral]
+        )
+
+        self.columns = CosmeticColumns(self)
+
+        self._name_fuzzy = None # built on the first fuzzy search, most refreshes never need it
+
+    def __len__(self):
+        return len(self.neutral)
+
+    def __iter__(self):
+        for handle in range(len(self.neutral)):
+            yield self.record(handle)
+
+    def __contains__(self, cosmetic_id: str):
+        return cosmetic_id in self.handles
+
+    def _add(self, cosmetic: dict):
+
+        neutral, strings = split_localized(cosmetic)
+
+        return self._add_entry(cosmetic['id'], neutral, strings)
+
+    def _add_entry(self, cosmetic_id: str, neutral: dict, strings: tuple):
+
+        if self.store != None:
+            neutral = self.store.intern(cosmetic_id, neutral)
+
+        handle = self.handles.get(cosmetic_id, None)
+
+        if handle != None: # duplicated id in payload, last one wins
+            self.neutral[handle] = neutral
+            self.strings[handle] = strings
+            return handle
+
+        handle = len(self.neutral)
+
+        self.neutral.append(neutral)
+        self.strings.append(strings)
+        self.handles[cosmetic_id] = handle
+        self.types.setdefault(neutral['type']['value'], []).append(handle)
+
+        return handle
+
+    def refresh(self, cosmetics: list):
+
+        # returns the catalog to swap in and what changed, this catalog is never modified
+        # so searches running on it keep working until the swap
+        incoming = {}
+
+        for cosmetic in cosmetics:
+            incoming[cosmetic['id']] = split_localized(cosmetic)
+
+        return self.refresh_split(incoming)
+
+    def refresh_split(self, incoming: dict):
+
+        # incoming is cosmetic id -> split_localized(cosmetic), callers can split while the payload streams
+        added = []
+        changed = []
+
+        for cosmetic_id, (neutral, strings) in incoming.items():
+
+            handle = self.handles.get(cosmetic_id, None)
+
+            if handle == None:
+                added.append(cosmetic_id)
+            elif strings != self.strings[handle] or neutral != self.neutral[handle]:
+                changed.append(cosmetic_id)
+
+        removed = [cosmetic_id for cosmetic_id in self.handles if cosmetic_id not in incoming]
+
+        delta = {'added': added, 'changed': changed, 'removed': removed}
+
+        if len(added) == 0 and len(changed) == 0 and len(removed) == 0:
+            return self, delta
+
+        # removals would shift every handle after them, big updates are cheaper to rebuild
+        if len(removed) != 0 or len(added) + len(changed) > len(self) // 4:
+
+            catalog = CosmeticCatalog.__new__(CosmeticCatalog)
+            catalog.language = self.language
+            catalog.store = self.store
+            catalog.neutral = []
+            catalog.strings = []
+            catalog.handles = {}
+            catalog.types = {}
+
+            for cosmetic_id, (neutral, strings) in incoming.items():
+                catalog._add_entry(cosmetic_id, neutral, strings)
+
+            catalog._finish()
+
+            return catalog, delta
+
+        return self._patch(incoming, changed + added), delta
+
+    def _patch(self, incoming: dict, cosmetic_ids: list):
+
+        # copy on write, new cosmetics get new handles at the end of the catalog
+        catalog = CosmeticCatalog.__new__(CosmeticCatalog)
+        catalog.language = self.language
+        catalog.store = self.store
+        catalog.neutral = list(self.neutral)
+        catalog.strings = list(self.strings)
+        catalog.handles = dict(self.handles)
+        catalog.types = dict(self.types) # type lists are copied only when touched
+        catalog.name_keys = list(self.name_keys)
+        catalog.id_keys = list(self.id_keys)
+
+        copied = set()
+
+        def type_handles(cosmetic_type: str):
+
+            if cosmetic_type not in copied:
+                catalog.types[cosmetic_type] = list(catalog.types.get(cosmetic_type, []))
+                copied.add(cosmetic_type)
+
+            return catalog.types[cosmetic_type]
+
+        name_changes = []
+        id_changes = []
+        touched = []
+
+        for cosmetic_id in cosmetic_ids:
+
+            neutral, strings = incoming[cosmetic_id]
+
+            if self.store != None:
+                neutral = self.store.intern(cosmetic_id, neutral)
+
+            handle = catalog.handles.get(cosmetic_id, None)
+            name_key = normalize(strings[0])
+
+            if handle == None:
+
+                handle = len(catalog.neutral)
+                id_key = normalize(cosmetic_id)
+
+                catalog.neutral.append(neutral)
+                catalog.strings.append(strings)
+                catalog.handles[cosmetic_id] = handle
+                catalog.name_keys.append(name_key)
+                catalog.id_keys.append(id_key)
+
+                type_handles(neutral['type']['value']).append(handle)
+
+                name_changes.append((handle, None, name_key))
+                id_changes.append((handle, None, id_key))
+
+            else:
+
+                old_type = catalog.neutral[handle]['type']['value']
+
+                if old_type != neutral['type']['value']:
+                    handles = type_handles(old_type)
+                    del handles[bisect_left(handles, handle)]
+                    insort(type_handles(neutral['type']['value']), handle)
+
+                name_changes.append((handle, catalog.name_keys[handle], name_key))
+
+                catalog.neutral[handle] = neutral
+                catalog.strings[handle] = strings
+                catalog.name_keys[handle] = name_key
+
+            touched.append(handle)
+
+        for cosmetic_type in copied:
+            if len(catalog.types[cosmetic_type]) == 0:
+                del catalog.types[cosmetic_type]
+
+        catalog.version = next(versions)
+
+        catalog.name_index = self.name_index.patch(name_changes)
+        catalog.id_index = self.id_index.patch(id_changes)
+
+        catalog.name_trigrams = self.name_trigrams.patch(catalog.name_keys, name_changes)
+        catalog.id_trigrams = self.id_trigrams.patch(catalog.id_keys, id_changes)
+
+        catalog.columns = self.columns.patch(catalog, touched)
+
+        catalog._name_fuzzy = None
+
+        return catalog
+
+    def record(self, handle: int):
+        return localize(self.neutral[handle], self.strings[handle])
+
+    def get_neutral(self, cosmetic_id: str):
+
+        handle = self.handles.get(cosmetic_id, None)
+
+        if handle == None:
+            return None
+
+        return self.neutral[handle]
+
+    def get(self, cosmetic_id: str):
+
+        handle = self.handles.get(cosmetic_id, None)
+
+        if handle == None:
+            return None
+
+        return self.record(handle)
+
+    def get_type(self, cosmetic_type: str):
+
+        handles = self.types.get(cosmetic_type, None)
+
+        if handles == None:
+            return None
+
+        return self.resolve(handles)
+
+    def resolve(self, handles: list):
+        return Results(self, handles)
+
+    def filter_types(self, handles: list, cosmetic_types: list):
+
+        for i in cosmetic_types:
+            if i not in self.types:
+                log.error(f'Unknown cosmetic type "{i}". Will be skipped')
+
+        return self.filter(handles, type = cosmetic_types)
+
+    def filter(self, handles: list = None, **filters):
+
+        # handles = None filters the whole catalog
+        mask = self.columns.mask(**filters)
+
+        if handles == None:
+            return np.flatnonzero(mask).tolist()
+
+        if len(handles) == 0:
+            return []
+
+        handles = np.asarray(handles, dtype=np.int64)
+
+        return handles[mask[handles]].tolist() # keeps the order of the search results
+
+    def display_name(self, handle: int):
+        return self.strings[handle][0]
+
+    def record_id(self, handle: int):
+        return self.neutral[handle]['id']
+
+    def search_fuzzy(self, query: str, limit: int = 25):
+
+        if self._name_fuzzy == None:
+            self._name_fuzzy = FuzzyIndex(self.name_keys)
+
+        return self._name_fuzzy.search(query, limit = limit) # best matches first
+
+class PlaylistCatalog(Catalog):
+
+    def __init__(self, language: str, playlists: list = None):
+
+        self.language = language
+
+        self.records = [] # handle -> playlist, keeps api order
+        self.handles = {} # playlist id -> handle
+
+        if playlists != None:
+            for playlist in playlists:
+                self._add(playlist)
+
+        self._build_indexes(
+            name_keys = [normalize(self.playlist_name(playlist)) for playlist in self.records],
+            id_keys = [normalize(playlist['id']) for playlist in self.records]
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __contains__(self, playlist_id: str):
+        return playlist_id in self.handles
+
+    @staticmethod
+    def playlist_name(playlist: dict):
+
+        if playlist['name'] == None: # some playlists don't have name
+            return playlist['id'].replace('playlist_', '')
+
+        if playlist['subName'] == None:
+            return playlist['name']
+
+        return f'{playlist["name"]} {playlist["subName"]}'
+
+    def _add(self, playlist: dict):
+
+        handle = self.handles.get(playlist['id'], None)
+
+        if handle != None:
+            self.records[handle] = playlist
+            return handle
+
+        handle = len(self.records)
+
+        self.records.append(playlist)
+        self.handles[playlist['id']] = handle
+
+        return handle
+
+    def refresh(self, playlists: list):
+
+        # playlists are few, any change rebuilds the whole catalog
+        incoming = {playlist['id']: playlist for playlist in playlists}
+
+        added = [playlist_id for playlist_id in incoming if playlist_id not in self.handles]
+        changed = [playlist_id for playlist_id in incoming if playlist_id in self.handles and incoming[playlist_id] != self.get(playlist_id)]
+        removed = [playlist_id for playlist_id in self.handles if playlist_id not in incoming]
+
+        delta = {'added': added, 'changed': changed, 'removed': removed}
+
+        if len(added) == 0 and len(changed) == 0 and len(removed) == 0:
+            return self, delta
+
+        return PlaylistCatalog(self.language, playlists), delta
+
+    def get(self, playlist_id: str):
+
+        handle = self.handles.get(playlist_id, None)
+
+        if handle == None:
+            return None
+
+        return self.records[handle]
+
+    def resolve(self, handles: list):
+        return Results(self, handles)
+
+    def record(self, handle: int):
+        return self.records[handle]
+
+    def display_name(self, handle: int):
+        return self.playlist_name(self.records[handle])
+
+    def record_id(self, handle: int):
+        return self.records[handle]['id']
+
+class SectionCatalog(Catalog):
+
+    def __init__(self, language: str, sections: list = None):
+
+        self.language = language
+
+        self.records = [] # handle -> shop section, keeps api order
+        self.handles = {} # section id -> handle
+
+        if sections != None:
+            for section in sections:
+                self.handles[section.get('sectionId', '')] = len(self.records)
+                self.records.append(section)
+
+        self._build_indexes(
+            name_keys = [normalize(section.get('sectionDisplayName', '')) for section in self.records],
+            id_keys = [normalize(section.get('sectionId', '')) for section in self.records]
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def resolve(self, handles: list):
+        return Results(self, handles)
+
+    def record(self, handle: int):
+        return self.records[handle]
+
+    def display_name(self, handle: int):
+
+        section = self.records[handle]
+
+        return section.get('sectionDisplayName', None) or section.get('sectionId', '')
+
+    def record_id(self, handle: int):
+        return self.records[handle].get('sectionId', '')
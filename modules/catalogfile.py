@@ -0,0 +1,297 @@
+from modules.catalog import CosmeticCatalog, CosmeticColumns, versions
+from modules.search import PrefixIndex, TrigramIndex
+from collections.abc import Mapping, Sequence
+import numpy as np
+import logging
+import struct
+import orjson
+import mmap
+import os
+
+log = logging.getLogger('FortniteData.modules.catalogfile')
+
+# prebuilt cosmetic catalog in one file, attached with mmap instead of parsing the json payload
+#
+#   header   magic, format version, record count, section count, sha256 of the source payload
+#   table    one (name, offset, length) entry per section
+#   sections 8 byte aligned, arrays are little endian numpy arrays, string tables are utf-8 joined by NUL
+#
+# records are stored one orjson document each and only decoded when read
+
+MAGIC = b'FDCATLG\x00'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<8sIIII32s') # magic, format version, flags, count, section count, source hash
+SECTION = struct.Struct('<16sQQ') # name, offset, length
+
+class CatalogFileError(Exception):
+    pass
+
+def _strings_table(values: list):
+
+    if any('\0' in value for value in values):
+        raise CatalogFileError('Strings can not contain NUL characters')
+
+    return '\0'.join(values).encode()
+
+def _tuples(value):
+    return tuple(_tuples(item) for item in value) if isinstance(value, list) else value
+
+def _record(data: bytes):
+
+    # json has no tuples, localized strings are compared as tuples by refresh_split
+    neutral, strings = orjson.loads(data)
+
+    return neutral, _tuples(strings)
+
+def write(catalog: CosmeticCatalog, path: str, source_hash: str = None):
+
+    # blocking, run it in a thread, the catalog is never modified once built
+    sections = {}
+
+    records = [orjson.dumps([neutral, strings]) for neutral, strings in zip(catalog.neutral, catalog.strings)]
+
+    sections['records'] = b''.join(records)
+    sections['record_offsets'] = np.cumsum([0] + [len(record) for record in records], dtype=np.uint64).tobytes()
+
+    sections['ids'] = _strings_table([neutral['id'] for neutral in catalog.neutral])
+    sections['name_keys'] = _strings_table(catalog.name_keys)
+    sections['id_keys'] = _strings_table(catalog.id_keys)
+
+    sections['name_order'] = np.asarray(catalog.name_index.handles, dtype=np.int32).tobytes()
+    sections['id_order'] = np.asarray(catalog.id_index.handles, dtype=np.int32).tobytes()
+
+    for name, index in (('name', catalog.name_trigrams), ('id', catalog.id_trigrams)):
+
+        grams = list(index.postings)
+        postings = [index.postings[gram] for gram in grams]
+
+        sections[f'{name}_grams'] = _strings_table(grams)
+        sections[f'{name}_offsets'] = np.cumsum([0] + [len(posting) for posting in postings], dtype=np.uint32).tobytes()
+        sections[f'{name}_postings'] = np.fromiter((handle for posting in postings for handle in posting), dtype=np.int32).tobytes()
+
+    columns = catalog.columns
+
+    for column in CosmeticColumns.CATEGORIES:
+        sections[f'col_{column}'] = columns.codes[column].astype(np.int32).tobytes()
+
+    sections['col_chapter'] = columns.chapter.astype(np.int16).tobytes()
+    sections['col_season'] = columns.season.astype(np.int16).tobytes()
+
+    sections['meta'] = orjson.dumps({
+        'language': catalog.language,
+        'types': catalog.types,
+        'vocabulary': columns.vocabulary,
+        'aliases': columns.aliases
+    })
+
+    table_size = HEADER.size + SECTION.size * len(sections)
+    offset = (table_size + 7) & ~7
+
+    table = []
+    body = []
+
+    for name, data in sections.items():
+
+        if len(name) > 16:
+            raise CatalogFileError(f'Section name "{name}" is too long')
+
+        padding = (-offset) & 7 # numpy views need aligned offsets
+
+        body.append(b'\0' * padding)
+        offset += padding
+
+        table.append(SECTION.pack(name.encode(), offset, len(data)))
+        body.append(data)
+        offset += len(data)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(catalog), len(sections), bytes.fromhex(source_hash) if source_hash != None else b'\0' * 32)
+    head = header + b''.join(table)
+
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(head)
+        f.write(b'\0' * (((len(head) + 7) & ~7) - len(head)))
+        for data in body:
+            f.write(data)
+
+    os.replace(f'{path}.tmp', path) # a catalog attached to the old file keeps its mapping
+
+class MappedRecords:
+
+    # decodes a record the first time one of its halves is read, neutral records are
+    # interned like the ones of a built catalog so the languages keep sharing them
+    def __init__(self, data: memoryview, offsets: np.ndarray, store = None):
+
+        self.data = data
+        self.offsets = offsets.tolist()
+        self.decoded = [None] * (len(self.offsets) - 1)
+        self.store = store
+
+    def __len__(self):
+        return len(self.decoded)
+
+    def get(self, handle: int):
+
+        record = self.decoded[handle]
+
+        if record == None:
+
+            # stored before interning, the store looks this catalog up too once it is attached
+            record = self.decoded[handle] = _record(self.data[self.offsets[handle]:self.offsets[handle + 1]])
+
+            if self.store != None:
+                neutral, strings = record
+                record = self.decoded[handle] = (self.store.intern(neutral['id'], neutral), strings)
+
+        return record
+
+class MappedColumn(Sequence):
+
+    # catalog.neutral or catalog.strings, handle -> one half of the record
+    def __init__(self, records: MappedRecords, half: int):
+
+        self.records = records
+        self.half = half
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return [self[handle] for handle in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        return self.records.get(index)[self.half]
+
+class MappedPostings(Mapping):
+
+    # trigram -> posting list, sliced out of one array on demand
+    def __init__(self, grams: list, offsets: np.ndarray, postings: np.ndarray):
+
+        self.grams = dict(zip(grams, range(len(grams))))
+        self.offsets = offsets
+        self.postings = postings
+
+    def __len__(self):
+        return len(self.grams)
+
+    def __iter__(self):
+        return iter(self.grams)
+
+    def __getitem__(self, gram):
+
+        i = self.grams[gram]
+
+        return self.postings[self.offsets[i]:self.offsets[i + 1]].tolist()
+
+def load(path: str, store = None, source_hash: str = None):
+
+    # returns the catalog or None when the file is missing, stale or from another format version
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+
+    with f:
+
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError: # empty file
+            return None
+
+    try:
+
+        magic, version, _, count, section_count, file_hash = HEADER.unpack_from(mapped, 0)
+
+        if magic != MAGIC or version != FORMAT_VERSION:
+            log.debug(f'"{path}" is not a catalog file of format version {FORMAT_VERSION}.')
+            mapped.close()
+            return None
+
+        if source_hash != None and file_hash.hex() != source_hash:
+            log.debug(f'"{path}" was built from another payload.')
+            mapped.close()
+            return None
+
+        view = memoryview(mapped)
+        sections = {}
+
+        for i in range(section_count):
+
+            name, offset, length = SECTION.unpack_from(mapped, HEADER.size + i * SECTION.size)
+
+            if offset + length > len(mapped):
+                raise CatalogFileError(f'Section "{name}" is out of bounds')
+
+            sections[name.rstrip(b'\0').decode()] = (offset, length)
+
+        def array(name: str, dtype):
+            offset, length = sections[name]
+            return np.frombuffer(mapped, dtype = dtype, count = length // np.dtype(dtype).itemsize, offset = offset)
+
+        def strings(name: str):
+            offset, length = sections[name]
+            return bytes(view[offset:offset + length]).decode().split('\0') if length != 0 else []
+
+        meta = orjson.loads(view[slice(sections['meta'][0], sum(sections['meta']))])
+
+        catalog = CosmeticCatalog.__new__(CosmeticCatalog)
+        catalog.language = meta['language']
+        catalog.store = store
+
+        offset, length = sections['records']
+        records = MappedRecords(view[offset:offset + length], array('record_offsets', np.uint64), store)
+
+        catalog.neutral = MappedColumn(records, 0)
+        catalog.strings = MappedColumn(records, 1)
+        catalog.handles = dict(zip(strings('ids'), range(count)))
+        catalog.types = meta['types']
+
+        catalog.version = next(versions)
+        catalog.name_keys = strings('name_keys')
+        catalog.id_keys = strings('id_keys')
+
+        for name in ('name', 'id'):
+
+            keys = getattr(catalog, f'{name}_keys')
+
+            index = PrefixIndex.__new__(PrefixIndex)
+            index.handles = array(f'{name}_order', np.int32).tolist()
+            index.keys = [keys[handle] for handle in index.handles]
+
+            trigrams = TrigramIndex.__new__(TrigramIndex)
+            trigrams.keys = keys
+            trigrams.postings = MappedPostings(strings(f'{name}_grams'), array(f'{name}_offsets', np.uint32), array(f'{name}_postings', np.int32))
+
+            setattr(catalog, f'{name}_index', index)
+            setattr(catalog, f'{name}_trigrams', trigrams)
+
+        columns = CosmeticColumns.__new__(CosmeticColumns)
+        columns.size = count
+        columns.vocabulary = meta['vocabulary']
+        columns.aliases = meta['aliases']
+        columns.codes = {column: array(f'col_{column}', np.int32) for column in CosmeticColumns.CATEGORIES}
+        columns.chapter = array('col_chapter', np.int16)
+        columns.season = array('col_season', np.int16)
+
+        catalog.columns = columns
+        catalog._name_fuzzy = None
+        catalog.mapped = mapped # the arrays and records above are views of it
+
+    except (KeyError, ValueError, struct.error, CatalogFileError, orjson.JSONDecodeError) as error:
+        log.error(f'"{path}" is corrupted: {error!r}')
+
+        try:
+            mapped.close()
+        except BufferError: # arrays made before the error still point into it, it is freed with them
+            pass
+
+        return None
+
+    return catalog
@@ -0,0 +1,231 @@
+from aiohttp import web
+import argparse
+import hashlib
+import logging
+import asyncio
+import aiohttp
+import random
+import orjson
+import os
+
+log = logging.getLogger('FortniteData.modules.fakeupstream')
+
+# local stand-in for every upstream the bot polls, point the base_urls in config.json at it:
+#   python -m modules.fakeupstream --port 8080 --latency 0.05 --error-rate 0.05 --rate-limit-rate 0.05
+
+# path -> (fixture file, content type, where it is recorded from)
+ROUTES = {
+    '/v2/cosmetics/br': ('cosmetics_br.json', 'application/json', 'https://fortnite-api.com/v2/cosmetics/br'),
+    '/v1/playlists': ('playlists.json', 'application/json', 'https://fortnite-api.com/v1/playlists'),
+    '/v2/news': ('news.json', 'application/json', 'https://fortnite-api.com/v2/news'),
+    '/v2/aes': ('aes.json', 'application/json', 'https://fortnite-api.com/v2/aes'),
+    '/v1/shopsections': ('shopsections.json', 'application/json', 'https://baydev.net/api/v1/shopsections'),
+    '/v1/fortnite-content': ('fortnite_content.json', 'application/json', 'https://baydev.net/api/v1/fortnite-content'),
+    '/v1/shop/shophash': ('shophash.txt', 'text/plain', 'https://api.nitestats.com/v1/shop/shophash'),
+    '/v1/shop/image': ('shop_image.png', 'image/png', 'https://api.nitestats.com/v1/shop/image')
+}
+
+class FakeUpstream:
+
+    def __init__(
+        self,
+        fixtures: str = 'fixtures/upstream',
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        rate_limit_rate: float = 0,
+        retry_after: int = 1,
+        cosmetics: int = None,
+        seed: int = None
+    ):
+
+        self.fixtures = fixtures
+        self.latency = latency # seconds added to every response, plus up to jitter more
+        self.jitter = jitter
+        self.error_rate = error_rate # share of requests answered with a 500
+        self.rate_limit_rate = rate_limit_rate # share of requests answered with a 429
+        self.retry_after = retry_after
+        self.cosmetics = cosmetics # the cosmetics fixture is grown to this many items
+
+        self.random = random.Random(seed)
+
+        self.bodies = {} # path -> (body, etag), read once
+        self.requests = {}
+        self.statuses = {}
+
+        self.runner = None
+
+    def _body(self, path: str):
+
+        if path not in self.bodies:
+
+            file, _, _ = ROUTES[path]
+
+            with open(os.path.join(self.fixtures, file), 'rb') as f:
+                body = f.read()
+
+            if path == '/v2/cosmetics/br' and self.cosmetics != None:
+                body = self._grow_cosmetics(body)
+
+            self.bodies[path] = (body, f'"{hashlib.sha256(body).hexdigest()}"')
+
+        return self.bodies[path]
+
+    def _grow_cosmetics(self, body: bytes):
+
+        # copies of the recorded items with new ids, enough for benchmarks on a realistic catalog size
+        payload = orjson.loads(body)
+        recorded = payload['data']
+
+        items = []
+
+        for i in range(self.cosmetics):
+
+            item = dict(recorded[i % len(recorded)])
+
+            if i >= len(recorded):
+                item['id'] = f'{item["id"]}_{i}'
+                item['name'] = f'{item["name"]} {i}'
+
+            items.append(item)
+
+        payload['data'] = items
+
+        return orjson.dumps(payload)
+
+    def set_fixture(self, path: str, body: bytes):
+
+        # replaces a response at runtime, for tests that need the upstream to change
+        self.bodies[path] = (body, f'"{hashlib.sha256(body).hexdigest()}"')
+
+    async def handle(self, request: web.Request):
+
+        path = request.path
+        self.requests[path] = self.requests.get(path, 0) + 1
+
+        delay = self.latency + self.random.random() * self.jitter
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        roll = self.random.random()
+
+        if roll < self.rate_limit_rate:
+            return self._respond(path, web.Response(status = 429, headers = {'Retry-After': str(self.retry_after)}))
+
+        if roll < self.rate_limit_rate + self.error_rate:
+            return self._respond(path, web.Response(status = 500))
+
+        if path not in ROUTES:
+            return self._respond(path, web.json_response({'status': 404, 'error': 'not found'}, status = 404))
+
+        body, etag = self._body(path)
+
+        if request.headers.get('If-None-Match', None) == etag:
+            return self._respond(path, web.Response(status = 304, headers = {'ETag': etag}))
+
+        return self._respond(path, web.Response(body = body, content_type = ROUTES[path][1], headers = {'ETag': etag}))
+
+    def _respond(self, path: str, response: web.Response):
+
+        key = f'{path} {response.status}'
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+        return response
+
+    async def stats(self, request: web.Request):
+        return web.json_response({'requests': self.requests, 'statuses': self.statuses}, dumps = lambda data: orjson.dumps(data).decode())
+
+    def app(self):
+
+        app = web.Application()
+        app.router.add_get('/_fake/stats', self.stats)
+        app.router.add_route('GET', '/{tail:.*}', self.handle)
+
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080):
+
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+
+        log.info(f'Fake upstream listening on http://{host}:{port}')
+
+    async def stop(self):
+
+        if self.runner != None:
+            await self.runner.cleanup()
+            self.runner = None
+
+async def record(fixtures: str = 'fixtures/upstream'):
+
+    # refreshes the fixtures from the real services
+    os.makedirs(fixtures, exist_ok = True)
+
+    async with aiohttp.ClientSession() as session:
+
+        for path, (file, _, url) in ROUTES.items():
+
+            async with session.get(url) as response:
+
+                if response.status != 200:
+                    log.error(f'Unable to record "{path}", upstream returned status {response.status}.')
+                    continue
+
+                body = await response.read()
+
+            with open(os.path.join(fixtures, file), 'wb') as f:
+                f.write(body)
+
+            log.info(f'Recorded "{path}" ({len(body)} bytes).')
+
+async def serve(upstream: FakeUpstream, host: str, port: int):
+
+    await upstream.start(host, port)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await upstream.stop()
+
+def main():
+
+    parser = argparse.ArgumentParser(description = 'Serves recorded upstream responses locally.')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8080)
+    parser.add_argument('--fixtures', default = 'fixtures/upstream')
+    parser.add_argument('--latency', type = float, default = 0)
+    parser.add_argument('--jitter', type = float, default = 0)
+    parser.add_argument('--error-rate', type = float, default = 0)
+    parser.add_argument('--rate-limit-rate', type = float, default = 0)
+    parser.add_argument('--retry-after', type = int, default = 1)
+    parser.add_argument('--cosmetics', type = int, default = None)
+    parser.add_argument('--seed', type = int, default = None)
+    parser.add_argument('--record', action = 'store_true', help = 'refresh the fixtures from the real services and exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level = logging.INFO)
+
+    if args.record:
+        asyncio.run(record(args.fixtures))
+        return
+
+    upstream = FakeUpstream(
+        fixtures = args.fixtures,
+        latency = args.latency,
+        jitter = args.jitter,
+        error_rate = args.error_rate,
+        rate_limit_rate = args.rate_limit_rate,
+        retry_after = args.retry_after,
+        cosmetics = args.cosmetics,
+        seed = args.seed
+    )
+
+    try:
+        asyncio.run(serve(upstream, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+from aiohttp import web
+from bisect import bisect_left
+import logging
+
+log = logging.getLogger('FortniteData.modules.metrics')
+
+# prometheus text format, scraped from http://<host>:<metrics_port>/metrics
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names: tuple, values: tuple, extra: str = None):
+
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+
+    if extra != None:
+        pairs.append(extra)
+
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+        self.values = {} # label values -> count
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+
+        for labels, value in self.values.items():
+            lines.append(f'{self.name}{_labels(self.labels, labels)} {_number(value)}')
+
+        return lines
+
+class Histogram:
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = ()):
+
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+
+        self.values = {} # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+
+        entry = self.values.get(labels, None)
+
+        if entry == None:
+            entry = self.values[labels] = [0] * (len(self.buckets) + 2)
+
+        i = bisect_left(self.buckets, value) # counts per bucket, made cumulative when rendered
+
+        if i < len(self.buckets):
+            entry[i] += 1
+
+        entry[-2] += value
+        entry[-1] += 1
+
+    def render(self):
+
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+
+        for labels, entry in self.values.items():
+
+            total = 0
+
+            for bound, count in zip(self.buckets, entry):
+                total += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f'{self.name}_bucket{_labels(self.labels, labels, le)} {total}')
+
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_labels(self.labels, labels, le)} {entry[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, labels)} {_number(entry[-2])}')
+            lines.append(f'{self.name}_count{_labels(self.labels, labels)} {entry[-1]}')
+
+        return lines
+
+class Registry:
+
+    def __init__(self):
+
+        self.metrics = []
+        self.collectors = [] # called on every scrape, return (name, type, help, labels, [(label values, value)])
+
+    def counter(self, name: str, help: str, labels: tuple = ()):
+
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+
+        return metric
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = ()):
+
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+
+        return metric
+
+    def collector(self, function):
+
+        self.collectors.append(function)
+
+        return function
+
+    def render(self):
+
+        lines = []
+
+        for metric in self.metrics:
+            lines.extend(metric.render())
+
+        for collector in self.collectors:
+
+            try:
+                families = collector()
+            except Exception:
+                log.exception('A metrics collector failed.')
+                continue
+
+            for name, type_, help, names, samples in families:
+
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {type_}')
+
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(names, labels)} {_number(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760, 104857600)
+
+caches = [] # anything with stats(), LRUCache, TTLCache or AssetCache
+
+def register_cache(cache):
+
+    if not any(registered is cache for registered in caches): # registering twice would duplicate its series
+        caches.append(cache)
+
+    return cache
+
+@registry.collector
+def collect_caches():
+
+    # one family per stat, every cache is a label of it
+    families = []
+    stats = [cache.stats() for cache in caches]
+
+    for key in ('size', 'hits', 'misses', 'evictions', 'stale_hits', 'bytes'):
+
+        samples = [((stat['name'],), stat[key]) for stat in stats if key in stat]
+
+        if samples:
+            families.append((f'fortnitedata_cache_{key}', 'gauge', f'Cache {key.replace("_", " ")}.', ('cache',), samples))
+
+    return families
+
+async def handle(request: web.Request):
+    return web.Response(body = registry.render().encode(), headers = {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+runner = None
+
+async def start_server(host: str = '127.0.0.1', port: int = 9090):
+
+    global runner
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+
+    runner = web.AppRunner(app, access_log = None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    log.info(f'Serving metrics on http://{host}:{port}/metrics')
+
+async def stop_server():
+
+    global runner
+
+    if runner != None:
+        await runner.cleanup()
+        runner = None
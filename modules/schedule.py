@@ -0,0 +1,106 @@
+from datetime import date, datetime, timedelta, timezone, time as dtime
+import logging
+
+log = logging.getLogger('FortniteData.modules.schedule')
+
+class RotationSchedule:
+
+    # the shop rotates at fixed utc times and patches land on known days, polls follow that instead of a flat timer
+    def __init__(
+        self,
+        rotation_times: list = ('00:00',),
+        patch_days: list = (1,), # weekday numbers, monday is 0
+        patch_hours: list = (4, 12), # utc hours of the patch day when updates usually land
+        warm_lead: float = 120, # seconds before a rotation the caches are warmed
+        hot_window: float = 900, # seconds after a rotation polled aggressively
+        shop_intervals: list = (10, 300), # hot, quiet
+        updates_intervals: list = (30, 60, 240) # hot, patch, quiet, quiet matches the old fixed 240 second loop
+    ):
+
+        self.rotation_times = sorted(dtime.fromisoformat(value).replace(tzinfo = timezone.utc) for value in rotation_times)
+        self.patch_days = tuple(patch_days)
+        self.patch_hours = tuple(patch_hours)
+        self.warm_lead = warm_lead
+        self.hot_window = hot_window
+        self.shop_intervals = tuple(shop_intervals)
+        self.updates_intervals = tuple(updates_intervals)
+
+    def warm_times(self):
+
+        # for tasks.loop(time = ...), a lead over midnight wraps to the previous day
+        times = []
+
+        for rotation in self.rotation_times:
+            at = datetime.combine(date(2000, 1, 2), rotation) - timedelta(seconds = self.warm_lead)
+            times.append(at.timetz())
+
+        return times
+
+    def last_rotation(self, now: datetime):
+
+        for day in (0, 1):
+            for rotation in reversed(self.rotation_times):
+                at = datetime.combine(now.date() - timedelta(days = day), rotation)
+                if at <= now:
+                    return at
+
+    def next_rotation(self, now: datetime):
+
+        for day in (0, 1):
+            for rotation in self.rotation_times:
+                at = datetime.combine(now.date() + timedelta(days = day), rotation)
+                if at > now:
+                    return at
+
+    def phase(self, now: datetime = None):
+
+        # hot right after a rotation, patch during the patch hours, quiet otherwise
+        now = now or datetime.now(timezone.utc)
+
+        if (now - self.last_rotation(now)).total_seconds() < self.hot_window:
+            return 'hot'
+
+        if now.weekday() in self.patch_days and self.patch_hours[0] <= now.hour < self.patch_hours[1]:
+            return 'patch'
+
+        return 'quiet'
+
+    def _until_next_phase(self, now: datetime):
+
+        # a long quiet sleep must not run past the start of the next rotation or patch window
+        until = (self.next_rotation(now) - now).total_seconds()
+
+        for day in range(8):
+
+            start = datetime.combine(now.date() + timedelta(days = day), dtime(self.patch_hours[0], tzinfo = timezone.utc))
+
+            if start > now and start.weekday() in self.patch_days:
+                until = min(until, (start - now).total_seconds())
+                break
+
+        return max(until, 1)
+
+    def shop_interval(self, now: datetime = None):
+
+        now = now or datetime.now(timezone.utc)
+        hot, quiet = self.shop_intervals
+
+        if self.phase(now) == 'hot':
+            return hot
+
+        return min(quiet, (self.next_rotation(now) - now).total_seconds() + 1) # first check lands right after the rotation
+
+    def updates_interval(self, now: datetime = None):
+
+        now = now or datetime.now(timezone.utc)
+        hot, patch, quiet = self.updates_intervals
+
+        phase = self.phase(now)
+
+        if phase == 'hot':
+            return hot
+
+        if phase == 'patch':
+            return patch
+
+        return min(quiet, self._until_next_phase(now) + 1)
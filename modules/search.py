@@ -0,0 +1,292 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import ChainMap
+import logging
+import time
+
+log = logging.getLogger('FortniteData.modules.search')
+
+def normalize(text: str):
+
+    if text == None:
+        return ''
+
+    return text.lower()
+
+class PrefixIndex:
+
+    def __init__(self, keys: list):
+
+        # keys must be already normalized, position in the list is the handle
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+
+        self.keys = [keys[handle] for handle in order]
+        self.handles = order
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prefix: str, limit: int = None):
+
+        prefix = normalize(prefix)
+
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\U0010ffff', lo=start)
+
+        if limit != None:
+            end = min(end, start + limit)
+
+        return self.handles[start:end]
+
+    def patch(self, changes: list):
+
+        # changes are (handle, old key or None, new key or None), returns a patched copy
+        index = PrefixIndex.__new__(PrefixIndex)
+        index.keys = list(self.keys)
+        index.handles = list(self.handles)
+
+        for handle, old_key, new_key in changes:
+
+            if old_key == new_key:
+                continue
+
+            if old_key != None:
+                lo = bisect_left(index.keys, old_key)
+                hi = bisect_right(index.keys, old_key, lo)
+                i = bisect_left(index.handles, handle, lo, hi) # equal keys are sorted by handle
+                del index.keys[i]
+                del index.handles[i]
+
+            if new_key != None:
+                lo = bisect_left(index.keys, new_key)
+                hi = bisect_right(index.keys, new_key, lo)
+                i = bisect_left(index.handles, handle, lo, hi)
+                index.keys.insert(i, new_key)
+                index.handles.insert(i, handle)
+
+        return index
+
+def trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TrigramIndex:
+
+    def __init__(self, keys: list):
+
+        # keys must be already normalized, position in the list is the handle
+        self.keys = keys
+        self.postings = {}
+
+        for handle, key in enumerate(keys):
+            for gram in trigrams(key):
+                self.postings.setdefault(gram, []).append(handle) # handles are added in order, lists stay sorted
+
+    def __len__(self):
+        return len(self.keys)
+
+    def patch(self, keys: list, changes: list):
+
+        # keys is the updated key list, only the touched posting lists are copied
+        index = TrigramIndex.__new__(TrigramIndex)
+        index.keys = keys
+
+        # postings of a mapped catalog file stay in the file, patched lists are laid over them
+        if isinstance(self.postings, dict):
+            index.postings = dict(self.postings)
+        elif isinstance(self.postings, ChainMap):
+            index.postings = ChainMap(dict(self.postings.maps[0]), *self.postings.maps[1:])
+        else:
+            index.postings = ChainMap({}, self.postings)
+
+        copied = set()
+
+        for handle, old_key, new_key in changes:
+
+            old_grams = trigrams(old_key) if old_key != None else set()
+            new_grams = trigrams(new_key) if new_key != None else set()
+
+            for gram in old_grams ^ new_grams:
+
+                if gram not in copied:
+                    index.postings[gram] = list(index.postings.get(gram, []))
+                    copied.add(gram)
+
+                posting = index.postings[gram]
+
+                if gram in old_grams:
+                    del posting[bisect_left(posting, handle)]
+                else:
+                    insort(posting, handle)
+
+        return index
+
+    def _candidates(self, query: str):
+
+        postings = []
+
+        for gram in trigrams(query):
+
+            posting = self.postings.get(gram, None)
+
+            if posting == None: # a missing trigram means no record can match
+                return []
+
+            postings.append(posting)
+
+        postings.sort(key=len)
+
+        candidates = postings[0]
+
+        for posting in postings[1:]:
+
+            size = len(posting)
+            matched = []
+
+            for handle in candidates:
+                i = bisect_left(posting, handle)
+                if i != size and posting[i] == handle:
+                    matched.append(handle)
+
+            candidates = matched
+
+            if len(candidates) == 0:
+                break
+
+        return candidates
+
+    def search(self, query: str, limit: int = None, deadline: float = None):
+
+        # deadline is a time.perf_counter() value, the scan stops there with what it found so far
+        query = normalize(query)
+
+        if len(query) < 3: # too short to have trigrams, it matches most records anyway
+            candidates = range(len(self.keys))
+        else:
+            candidates = self._candidates(query)
+
+        results = []
+
+        for i, handle in enumerate(candidates):
+
+            if deadline != None and i % 1024 == 0 and time.perf_counter() > deadline:
+                log.debug(f'Search for "{query}" stopped at its deadline after {i} of {len(candidates)} candidates.')
+                break
+
+            if query in self.keys[handle]: # trigrams only narrow, verify the real substring
+                results.append(handle)
+
+                if limit != None and len(results) >= limit:
+                    break
+
+        return results
+
+def deletes(term: str, max_distance: int):
+
+    results = {term}
+    edge = {term}
+
+    for _ in range(max_distance):
+
+        next_edge = set()
+
+        for word in edge:
+            for i in range(len(word)):
+                next_edge.add(word[:i] + word[i + 1:])
+
+        next_edge -= results
+        results |= next_edge
+        edge = next_edge
+
+    return results
+
+def edit_distance(a: str, b: str, max_distance: int):
+
+    # optimal string alignment distance, gives up once every path is over max_distance
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+
+    for i in range(1, len(a) + 1):
+
+        current = [i] + [0] * len(b)
+
+        for j in range(1, len(b) + 1):
+
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + cost
+            )
+
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+
+        if min(current) > max_distance:
+            return max_distance + 1
+
+        previous2, previous = previous, current
+
+    return previous[-1]
+
+class FuzzyIndex:
+
+    def __init__(self, keys: list, max_distance: int = 2, prefix_length: int = 7):
+
+        # symspell style, only the deletes of every term prefix are precomputed
+        self.keys = keys
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+
+        self.terms = {} # term -> handles, full names and their single words
+        self.deletes = {} # deleted prefix -> terms
+
+        for handle, key in enumerate(keys):
+
+            for term in {key, *key.split()}:
+
+                if len(term) < 3:
+                    continue
+
+                self.terms.setdefault(term, []).append(handle)
+
+        for term in self.terms:
+            for variant in deletes(term[:prefix_length], max_distance):
+                self.deletes.setdefault(variant, []).append(term)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query: str, limit: int = 25):
+
+        query = ' '.join(normalize(query).split())
+
+        if len(query) < 3:
+            return []
+
+        max_distance = 1 if len(query) <= 4 else self.max_distance
+
+        terms = set()
+
+        for variant in deletes(query[:self.prefix_length], max_distance):
+            terms.update(self.deletes.get(variant, ()))
+
+        ranks = {} # handle -> best (distance, word match, key length)
+
+        for term in terms:
+
+            distance = edit_distance(query, term, max_distance)
+
+            if distance > max_distance:
+                continue
+
+            for handle in self.terms[term]:
+
+                rank = (distance, term != self.keys[handle], len(self.keys[handle]))
+
+                if handle not in ranks or rank < ranks[handle]:
+                    ranks[handle] = rank
+
+        return sorted(ranks, key=lambda handle: (ranks[handle], handle))[:limit]
@@ -0,0 +1,101 @@
+import aiofiles
+import hashlib
+import logging
+import asyncio
+import orjson
+import zlib
+import os
+
+log = logging.getLogger('FortniteData.modules.snapshot')
+
+# gzip body after a fixed size header: magic, sha256 of the uncompressed body and a newline
+MAGIC = b'FDSNAP1\n'
+HEADER_SIZE = len(MAGIC) + 64 + 1
+
+LEVEL = 6
+
+class SnapshotError(Exception):
+    pass
+
+def encode(body: bytes, digest: str = None):
+
+    compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, 31) # 31 = gzip container
+
+    if digest == None:
+        digest = hashlib.sha256(body).hexdigest()
+
+    return MAGIC + digest.encode() + b'\n' + compressor.compress(body) + compressor.flush()
+
+def decode(data: bytes):
+
+    # plain json from older versions is returned as is
+    if data.startswith(MAGIC) == False:
+        return data
+
+    digest = data[len(MAGIC):HEADER_SIZE - 1].decode()
+    body = zlib.decompress(data[HEADER_SIZE:], 31)
+
+    if hashlib.sha256(body).hexdigest() != digest:
+        raise SnapshotError('Snapshot content does not match its hash')
+
+    return body
+
+async def read(path: str):
+
+    async with aiofiles.open(path, 'rb') as f:
+        data = await f.read()
+
+    return await asyncio.to_thread(decode, data)
+
+async def read_json(path: str):
+    return orjson.loads(await read(path))
+
+async def write(path: str, body: bytes):
+
+    # written aside and moved in place, readers never see a partial snapshot
+    data = await asyncio.to_thread(encode, body)
+
+    async with aiofiles.open(f'{path}.tmp', 'wb') as f:
+        await f.write(data)
+
+    os.replace(f'{path}.tmp', path)
+
+async def write_json(path: str, data):
+    await write(path, orjson.dumps(data))
+
+class Writer:
+
+    # compresses a body that arrives in chunks, the hash is filled in once it is known
+    def __init__(self, path: str):
+
+        self.path = path
+        self.file = None
+        self.compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, 31)
+        self.size = 0
+
+    async def open(self):
+
+        self.file = await aiofiles.open(self.path, 'wb')
+        await self.file.write(MAGIC + b'0' * 64 + b'\n')
+
+    async def write(self, chunk: bytes):
+
+        self.size += len(chunk)
+
+        data = self.compressor.compress(chunk)
+
+        if data:
+            await self.file.write(data)
+
+    async def close(self, digest: str = None):
+
+        if self.file == None:
+            return
+
+        # without a digest the snapshot is incomplete and only closed
+        if digest != None:
+            await self.file.write(self.compressor.flush())
+            await self.file.seek(len(MAGIC))
+            await self.file.write(digest.encode())
+
+        await self.file.close()
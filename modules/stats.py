@@ -0,0 +1,135 @@
+from modules.cache import TTLCache
+from modules.search import normalize
+from modules import api, metrics
+import traceback
+import logging
+import asyncio
+import orjson
+
+log = logging.getLogger('FortniteData.modules.stats')
+
+class StatsService:
+
+    # player stats don't depend on the language, one service answers every /stats
+    def __init__(
+        self,
+        client: api.FortniteAPI,
+        ttl: float = 120,
+        stale: float = 600,
+        negative_ttl: float = api.NEGATIVE_TTL,
+        concurrency: int = 4,
+        maxsize: int = 4096
+    ):
+
+        self.client = client
+        self.ttl = ttl
+        self.stale = stale # an expired entry is still served this long while it refreshes
+        self.negative_ttl = negative_ttl
+        self.concurrency = concurrency # bulk lookups in flight at the same time
+
+        # payloads keep the rendered image url, a cached answer needs no other request
+        self.cache = metrics.register_cache(TTLCache('stats', maxsize = maxsize))
+
+        self.tasks = set()
+
+    @staticmethod
+    def key(name: str, account_type: str = 'epic', time_window: str = 'lifetime', image: str = 'all'):
+        return (normalize(name).strip(), account_type, time_window, image) # display names are case insensitive
+
+    async def get(self, name: str, account_type: str = 'epic', time_window: str = 'lifetime', image: str = 'all'):
+
+        # returns the api payload, its status is 404 for unknown and 403 for private accounts
+        key = self.key(name, account_type, time_window, image)
+
+        payload, stale = self.cache.lookup(key)
+
+        if payload != None:
+
+            if stale and ('stats', key) not in api.inflight.calls:
+                log.debug(f'Serving stale stats of "{name}", refreshing in background.')
+                task = asyncio.ensure_future(self._refresh(key, name, account_type, time_window, image))
+                self.tasks.add(task) # the loop only keeps weak references to tasks
+                task.add_done_callback(self.tasks.discard)
+
+            return payload
+
+        return await self._fetch(key, name, account_type, time_window, image)
+
+    async def get_many(self, accounts: list, refresh: bool = False):
+
+        # accounts are (name, account_type, time_window) tuples, returns key -> payload
+        # lookups are background requests so commands keep priority at the rate limiter
+        semaphore = asyncio.Semaphore(self.concurrency)
+        unique = {self.key(*account): account for account in accounts}
+
+        async def run(key, account):
+
+            async with semaphore:
+
+                api.background.set(True) # every gathered lookup runs in its own context copy
+
+                if refresh:
+                    return await self._fetch(key, *account)
+
+                return await self.get(*account)
+
+        results = await asyncio.gather(*[run(key, account) for key, account in unique.items()], return_exceptions = True)
+
+        payloads = {}
+
+        for key, result in zip(unique, results):
+
+            if isinstance(result, BaseException):
+                log.error(f'Failed to look up stats of "{key[0]}": {result!r}')
+                continue
+
+            payloads[key] = result
+
+        return payloads
+
+    async def _refresh(self, key: tuple, *account):
+
+        try:
+            await self._fetch(key, *account)
+        except Exception:
+            log.error(f'Failed to refresh stats of "{key[0]}" in background. Traceback:\n{traceback.format_exc()}')
+
+    async def _fetch(self, key: tuple, name: str, account_type: str = 'epic', time_window: str = 'lifetime', image: str = 'all'):
+        return await api.inflight.run(('stats', key), lambda: self._request(key, name, account_type, time_window, image))
+
+    async def _request(self, key: tuple, name: str, account_type: str, time_window: str, image: str):
+
+        response = await self.client.send_request(
+            method = 'GET',
+            endpoint = '/v2/stats/br/v2',
+            parameters = {
+                'name': name,
+                'accountType': account_type,
+                'timeWindow': time_window,
+                'image': image
+            }
+        )
+
+        try:
+            payload = await response.json()
+        except orjson.JSONDecodeError:
+            payload = {'status': response.status, 'error': None}
+
+        if response.status == 200:
+            self.cache.set(key, payload, self.ttl, self.stale)
+
+        elif response.status in api.NEGATIVE_STATUSES: # unknown and private accounts are asked for again and again
+            self.cache.set(key, payload, self.negative_ttl)
+
+        else:
+
+            # an expired answer beats an error while the upstream struggles
+            previous = self.cache.peek(key)
+
+            if previous != None:
+                log.warning(f'Stats of "{name}" returned status {response.status}, serving the cached ones.')
+                return previous
+
+            log.error(f'Stats of "{name}" returned status {response.status}.')
+
+        return payload
@@ -1,14 +1,21 @@
 from urllib.parse import urlencode
+from array import array
 from motor import motor_asyncio
 from pymongo import results
+from modules.catalog import CosmeticCatalog, CosmeticStore, PlaylistCatalog, SectionCatalog, is_cosmetic_id, split_localized
+from modules.search import normalize
+from modules.stats import StatsService
+from modules.cache import LRUCache
+from modules import api, snapshot, metrics, catalogfile
 import traceback
 import aiofiles
 import logging
 import asyncio
-import discord
 import aiohttp
+import discord
 import time
 import json
+import zlib
 import sys
 
 ###
@@ -26,11 +33,26 @@ database = None
 ready = False
 languages = {}
 fortniteapi = {}
+cosmetic_store = CosmeticStore() # language neutral cosmetic data shared by every fortniteapi
+shop_sections = {}
+# handles are stored as int32 arrays and the cache is bounded by how many it holds, a short
+# contains query can match the whole catalog. Entries of a swapped out catalog are dropped
+search_cache = metrics.register_cache(LRUCache('search', maxsize = 4096, maxweight = 1_000_000, weigh = len))
 error_cache = {}
+stats_service = None # shared by every language
 
 on_ready_count = 0
 start_time = time.time()
 
+@metrics.registry.collector
+def collect_metrics():
+    return [
+        ('fortnitedata_catalog_records', 'gauge', 'Records loaded per catalog and language.', ('catalog', 'language'), [
+            *[(('cosmetics', language), len(fortniteapi[language].catalog)) for language in fortniteapi],
+            *[(('playlists', language), len(fortniteapi[language].playlists)) for language in fortniteapi]
+        ])
+    ]
+
 ###
 ## Critical
 ###
@@ -54,6 +76,22 @@ def get_config():
             log.critical(f'Failed while trying to load "config.json" file. Traceback:\n{traceback.format_exc()}')
             sys.exit(1)
 
+def drop_searches(kind: str, language: str, version: int):
+    return search_cache.prune(lambda key: key[0] == kind and key[1] == language and key[2] != version)
+
+def get_stats_service():
+
+    global stats_service
+
+    if stats_service == None:
+
+        stats_service = StatsService(
+            api.FortniteAPI(configuration.get('fortnite-api-key')),
+            concurrency = configuration.get('stats_concurrency', 4)
+        )
+
+    return stats_service
+
 def get_mongoclient():
 
     log.debug('Connecting to MongoDB cluster...')
@@ -268,208 +306,249 @@ class FortniteAPI:
 
         self.language = language
 
-        self.ClientSession = aiohttp.ClientSession
-        self.headers = {
-            'Authorization': configuration.get('fortnite-api-key')
-        }
+        self.api = api.FortniteAPI(configuration.get('fortnite-api-key')) # pooled session shared with every other api
 
         self._loaded_cosmetics = False
         self._loaded_playlists = False
-        
-        self.all_cosmetics = []
 
-        self.outfits = []
-        self.emotes = []
-        self.backpacks = []
-        self.pickaxes = []
-        self.wraps = []
-        self.contrails = []
-        self.loadingscreens = []
-        self.sprays = []
-        self.gliders = []
-        self.banners = []
+        self.catalog = CosmeticCatalog(language, store = cosmetic_store)
+
+        self.playlists = PlaylistCatalog(language)
 
-        self.playlists = []
+        self.delta = {'added': [], 'changed': [], 'removed': []} # what the last cosmetics refresh changed
+
+    async def _read_cached(self, path: str):
+
+        # cached payloads are full api responses, old playlist caches are the bare list
+        try:
+            data = json.loads(await snapshot.read(path))
+        except FileNotFoundError:
+            return None
+        except (snapshot.SnapshotError, zlib.error, ValueError): # half written or corrupted, fetched again
+            log.warning(f'[{self.language}] Cached payload "{path}" is corrupted, ignoring it.')
+            return None
 
+        return data['data'] if isinstance(data, dict) else data
 
     async def _load_cosmetics(self):
 
         log.debug(f'[{self.language}] Updating cosmetic cache...')
 
-        async with self.ClientSession() as session:
-            
-            response = await session.get(f'https://fortnite-api.com/v2/cosmetics/br?language={self.language}', headers=self.headers)
+        path = f'cache/cosmetics/all_{self.language}.json'
+        catalog_path = f'cache/cosmetics/all_{self.language}.catalog'
+
+        if self._loaded_cosmetics == False:
+
+            # validators only describe the cached file, load it first so a 304 still leaves a catalog
+            source_hash = (await api.load_validators(path)).get('hash', None)
+            catalog = catalogfile.load(catalog_path, store = cosmetic_store, source_hash = source_hash) if source_hash != None else None
+
+            if catalog != None:
+
+                log.debug(f'[{self.language}] Attached prebuilt catalog "{catalog_path}".')
+                self.catalog = catalog
+                cosmetic_store.attach(self.catalog)
 
-            if response.status != 200:
-                data = None
             else:
-                data = await response.json()
 
-            if data == None:
-                log.warning('Something was wrong with cosmetics API. Using cached cosmetics')
-                async with aiofiles.open(f'cache/cosmetics/all_{self.language}.json', 'r', encoding='utf-8') as f:
-                    data = json.loads(await f.read())
+                cached = await self._read_cached(path)
+
+                if cached != None:
+                    self.catalog = CosmeticCatalog(self.language, cached, store = cosmetic_store)
+                    cosmetic_store.attach(self.catalog)
 
-        for cosmetic in data['data']:
+                    if source_hash != None: # the next start attaches instead of parsing
+                        await self._write_catalog(catalog_path, source_hash)
 
-            if cosmetic not in self.all_cosmetics:
-                self.all_cosmetics.append(cosmetic)
+        validators = await api.load_validators(path) if len(self.catalog) != 0 else {}
 
-            if cosmetic['type']['value'] == 'outfit':
-                if cosmetic not in self.outfits:
-                    self.outfits.append(cosmetic)
-                    continue
+        try:
 
-            if cosmetic['type']['value'] == 'emote':
-                if cosmetic not in self.emotes:
-                    self.emotes.append(cosmetic)
-                    continue
+            async with self.api.stream_request('/v2/cosmetics/br', parameters = {'language': self.language}, validators = validators, path = path) as response:
 
-            if cosmetic['type']['value'] == 'backpack':
-                if cosmetic not in self.backpacks:
-                    self.backpacks.append(cosmetic)
-                    continue
-            
-            if cosmetic['type']['value'] == 'pickaxe':
-                if cosmetic not in self.pickaxes:
-                    self.pickaxes.append(cosmetic)
-                    continue
-
-            if cosmetic['type']['value'] == 'wrap':
-                if cosmetic not in self.wraps:
-                    self.wraps.append(cosmetic)
-                    continue
-
-            if cosmetic['type']['value'] == 'contrail':
-                if cosmetic not in self.contrails:
-                    self.contrails.append(cosmetic)
-                    continue
-
-            if cosmetic['type']['value'] == 'loadingscreen':
-                if cosmetic not in self.loadingscreens:
-                    self.loadingscreens.append(cosmetic)
-                    continue
-
-            if cosmetic['type']['value'] == 'spray':
-                if cosmetic not in self.sprays:
-                    self.sprays.append(cosmetic)
-                    continue
-
-            if cosmetic['type']['value'] == 'glider':
-                if cosmetic not in self.gliders:
-                    self.gliders.append(cosmetic)
-                    continue
-
-            if cosmetic['type']['value'] == 'banner':
-                if cosmetic not in self.banners:
-                    self.banners.append(cosmetic)
-                    continue
-      
-
-        async with aiofiles.open(f'cache/cosmetics/all_{self.language}.json', 'w', encoding='utf-8') as f:
-            await f.write(json.dumps(data))
+                if response.not_modified(validators):
+
+                    log.debug(f'[{self.language}] Cosmetics not modified.')
+                    api.unchanged_total.inc(self.api.name, '/v2/cosmetics/br')
+                    self.delta = {'added': [], 'changed': [], 'removed': []}
+
+                elif response.status != 200:
+
+                    log.warning('Something was wrong with cosmetics API. Using cached cosmetics')
+                    self.delta = {'added': [], 'changed': [], 'removed': []}
+
+                else:
+
+                    # items are split as they arrive, the payload is never held whole in memory
+                    incoming = {}
+
+                    async for cosmetic in response.items():
+                        incoming[cosmetic['id']] = split_localized(cosmetic)
+
+                    if response.not_modified(validators): # same bytes from a server without validators
+
+                        log.debug(f'[{self.language}] Cosmetics not modified.')
+                        api.unchanged_total.inc(self.api.name, '/v2/cosmetics/br')
+                        self.delta = {'added': [], 'changed': [], 'removed': []}
+
+                    else:
+
+                        # built aside and swapped in one assignment, searches never see a half updated catalog
+                        catalog, delta = self.catalog.refresh_split(incoming)
+
+                        if len(self.catalog) == 0: # first population without a cache, nothing new to announce
+                            delta = {'added': [], 'changed': [], 'removed': []}
+
+                        self.catalog = catalog
+                        self.delta = delta
+                        cosmetic_store.attach(catalog)
+
+                        await response.save() # the teed payload and its validators
+                        await self._write_catalog(catalog_path, response.hash)
+
+                        log.debug(f'[{self.language}] {len(delta["added"])} cosmetics added, {len(delta["changed"])} changed, {len(delta["removed"])} removed.')
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError): # the connection dropped or the payload was cut
+
+            if len(self.catalog) == 0:
+                raise
+
+            log.warning(f'[{self.language}] Unable to update cosmetics, using cached cosmetics. Traceback:\n{traceback.format_exc()}')
+            self.delta = {'added': [], 'changed': [], 'removed': []}
 
         self._loaded_cosmetics = True
 
-        log.debug(f'[{self.language}] Updated cosmetic cache. Loaded {len(self.all_cosmetics)} cosmetics.')
+        drop_searches('cosmetics', self.language, self.catalog.version)
+
+        log.debug(f'[{self.language}] Updated cosmetic cache. Loaded {len(self.catalog)} cosmetics.')
 
-        return self.all_cosmetics
+        return self.delta
+
+    async def _write_catalog(self, path: str, source_hash: str):
+
+        try:
+            await asyncio.to_thread(catalogfile.write, self.catalog, path, source_hash)
+        except (catalogfile.CatalogFileError, OSError) as error:
+            log.warning(f'[{self.language}] Unable to write "{path}": {error!r}')
 
     async def _load_playlists(self):
 
         log.debug(f'[{self.language}] Updating playlists cache...')
 
-        data = await self.get_playlists(language=self.language)
+        path = f'cache/playlists/{self.language}.json'
 
-        if data == False:
-            log.warning('Something was wrong with playlists API. Using cached playlists')
-            
-            async with aiofiles.open(f'cache/playlists/{self.language}.json', 'r', encoding='utf-8') as f:
-                data = json.loads(await f.read())
+        if self._loaded_playlists == False:
 
-        addedCount = 0
+            cached = await self._read_cached(path)
 
-        for playlist in data['data']:
+            if cached != None:
+                self.playlists = PlaylistCatalog(self.language, cached)
 
-            if playlist not in self.playlists:
+        validators = await api.load_validators(path) if len(self.playlists) != 0 else {}
+
+        try:
+
+            response = await self.api.send_request('GET', '/v1/playlists', parameters = {'language': self.language}, validators = validators)
+
+            if response.not_modified(validators):
+
+                log.debug(f'[{self.language}] Playlists not modified.')
+                api.unchanged_total.inc(self.api.name, '/v1/playlists')
+                delta = {'added': [], 'changed': [], 'removed': []}
+
+            elif response.status != 200:
+
+                log.warning('Something was wrong with playlists API. Using cached playlists')
+                delta = {'added': [], 'changed': [], 'removed': []}
+
+            else:
+
+                data = await response.json()
+
+                empty = len(self.playlists) == 0
+
+                self.playlists, delta = self.playlists.refresh(data['data'])
+
+                if empty: # first population without a cache, nothing new to announce
+                    delta = {'added': [], 'changed': [], 'removed': []}
+
+                await snapshot.write(path, response.body)
+
+                await api.save_validators(path, response.validators())
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+
+            if len(self.playlists) == 0:
+                raise
+
+            log.warning(f'[{self.language}] Unable to update playlists, using cached playlists. Traceback:\n{traceback.format_exc()}')
+            delta = {'added': [], 'changed': [], 'removed': []}
 
-                self.playlists.append(playlist)
-                addedCount += 1
-        
         self._loaded_playlists = True
 
-        log.debug(f'[{self.language}] Updated playlists cache. Loaded {addedCount} playlists.')
+        drop_searches('playlists', self.language, self.playlists.version)
+
+        log.debug(f'[{self.language}] Updated playlists cache. Loaded {len(self.playlists)} playlists.')
 
-        return self.playlists
+        return delta
         
-    async def get_cosmetic(self, query: str, **kwargs):
+    async def get_cosmetic(self, query: str = None, **kwargs):
 
         cosmetic_types = kwargs.get('cosmetic_types', None)
         match_method = kwargs.get('match_method', 'starts')
 
-        if len(self.all_cosmetics) == 0:
+        # rarity, series, set, chapter and season, vectorized over the catalog columns
+        filters = {key: kwargs[key] for key in ('rarity', 'series', 'set', 'chapter', 'season') if kwargs.get(key, None) != None}
+
+        catalog = self.catalog # a refresh may swap it while we search
+
+        if len(catalog) == 0:
             return False
 
-        lists_to_search = []
+        key = (
+            'cosmetics',
+            self.language,
+            catalog.version,
+            normalize(query),
+            match_method,
+            tuple(cosmetic_types) if cosmetic_types != None else None,
+            tuple(sorted(filters.items())),
+            kwargs.get('limit', 25) if match_method == 'fuzzy' else None
+        )
 
-        if cosmetic_types != None:
+        handles = search_cache.get(key)
 
-            for i in cosmetic_types:
-
-                if i == 'outfit':
-                    lists_to_search.append(self.outfits)
-                elif i == 'emote':
-                    lists_to_search.append(self.emotes)
-                elif i == 'backpack':
-                    lists_to_search.append(self.backpacks)
-                elif i == 'pickaxe':
-                    lists_to_search.append(self.pickaxes)
-                elif i == 'wrap':
-                    lists_to_search.append(self.wraps)
-                elif i == 'contrail':
-                    lists_to_search.append(self.contrails)
-                elif i == 'loadingscreen':
-                    lists_to_search.append(self.loadingscreens)
-                elif i == 'spray':
-                    lists_to_search.append(self.sprays)
-                elif i == 'glider':
-                    lists_to_search.append(self.gliders)
-                elif i == 'banner':
-                    lists_to_search.append(self.banners)
-                else:
-                    log.error(f'Unknown cosmetic type "{i}". Will be skipped')
+        if handles != None:
+            return catalog.resolve(handles)
 
-        else:
+        is_id = is_cosmetic_id(query) if query else False
 
-            lists_to_search = [self.all_cosmetics]
+        if not query:
+            handles = None # only filters
 
-        results = []
+        elif match_method == 'starts':
+            handles = catalog.search_starts(query, by_id = is_id)
 
-        is_id = query.lower().startswith(('cid_', 'bid_', 'pickaxe_', 'eid_', 'musicpack_', 'spid_', 'lsid_', 'wrap_', 'glider_', 'bannertoken_'))
+        elif match_method == 'contains':
+            handles = catalog.search_contains(query, by_id = is_id)
 
-        for cosmeticlist in lists_to_search:
+        elif match_method == 'fuzzy':
+            handles = catalog.search_fuzzy(query, limit = kwargs.get('limit', 25))
 
-            for item in cosmeticlist:
+        else:
+            log.error(f'Unknown match method "{match_method}".')
+            handles = []
 
-                if is_id:
-                    if match_method == 'starts':
-                        if item['id'].lower().startswith(query.lower()):
-                            results.append(item)
+        if cosmetic_types != None:
+            handles = catalog.filter_types(handles, cosmetic_types)
 
-                    elif match_method == 'contains':
-                        if query.lower() in item['id'].lower():
-                            results.append(item)
+        if len(filters) != 0 or handles == None:
+            handles = catalog.filter(handles, **filters)
 
-                else:
-                    if match_method == 'starts':
-                        if item['name'].lower().startswith(query.lower()):
-                            results.append(item)
-                    
-                    elif match_method == 'contains':
-                        if query.lower() in item['name'].lower():
-                            results.append(item)
+        handles = array('i', handles)
+        search_cache.set(key, handles)
 
-        return results
+        return catalog.resolve(handles)
 
     async def get_playlist(self, query: str, **kwargs):
 
@@ -477,106 +556,82 @@ class FortniteAPI:
 
         log.debug(f'Searching playlists with match method "{match_method}". Query: "{query}"')
 
-        if len(self.playlists) == 0:
+        playlists = self.playlists
+
+        if len(playlists) == 0:
             return False
 
-        results = []
+        key = ('playlists', self.language, playlists.version, normalize(query), match_method)
 
-        is_id = query.lower().startswith('playlist_')
+        handles = search_cache.get(key)
 
-        for playlist in self.playlists:
+        if handles != None:
+            return playlists.resolve(handles)
 
-            if is_id:
-                if match_method == 'starts':
-                    if playlist['id'].lower().startswith(query.lower()):
-                        results.append(playlist)
+        is_id = normalize(query).startswith('playlist_')
 
-                elif match_method == 'contains':
-                    if query.lower() in playlist['id'].lower():
-                        results.append(playlist)
+        if match_method == 'starts':
+            handles = playlists.search_starts(query, by_id = is_id)
 
-            else:
+        elif match_method == 'contains':
+            handles = playlists.search_contains(query, by_id = is_id)
 
-                if playlist['name'] == None: # some playlists don't have name
-                    nameOrId = playlist['id'].replace('playlist_', '')
-                else:
-                    if playlist['subName'] == None:
-                        nameOrId = f'{playlist["name"]}'
-                    else:
-                        nameOrId = f'{playlist["name"]} {playlist["subName"]}'
+        else:
+            log.error(f'Unknown match method "{match_method}".')
+            handles = []
 
-                if match_method == 'starts':
-                    if nameOrId.lower().startswith(query.lower()):
-                        results.append(playlist)
-                
-                elif match_method == 'contains':
-                    if query.lower() in nameOrId.lower():
-                        results.append(playlist)
+        handles = array('i', handles)
+        search_cache.set(key, handles)
 
-        return results
+        return playlists.resolve(handles)
 
     async def get_new_items(self, language='en'):
 
-        async with self.ClientSession() as session:
-                
-            response = await session.get(f'https://fortnite-api.com/v2/cosmetics/br/new?language={language}', headers=self.headers)
-
-            if response.status != 200:
-                return False
-            else:
-                return await response.json()
-
-    async def get_news(self, language='en'):
-
-        async with self.ClientSession() as session:
-
-            response = await session.get(f'https://fortnite-api.com/v2/news?language={language}', headers=self.headers)
-
-            if response.status != 200:
-                return False
-            else:
-                return await response.json()
+        response = await self.api.send_request('GET', '/v2/cosmetics/br/new', parameters = {'language': language})
 
-    async def get_aes(self, keyformat='hex'):
-
-        async with self.ClientSession() as session:
+        if response.status != 200:
+            return False
+        else:
+            return await response.json()
 
-            response = await session.get(f'https://fortnite-api.com/v2/aes?keyFormat={keyformat}', headers=self.headers)
+    async def get_news(self, language='en', cache=True):
 
-            if response.status != 200:
-                return False
-            else:
-                return await response.json()
+        response = await self.api.send_request('GET', '/v2/news', parameters = {'language': language}, snapshot = f'cache/news/{language}.json', cache = cache)
 
-    async def get_stats(self, account_name=None, account_type='epic'):
+        if response.status != 200:
+            return False
+        else:
+            return await response.json()
 
-        async with self.ClientSession() as session:
+    async def get_aes(self, keyformat='hex', cache=True):
 
-            response = await session.get(f'https://fortnite-api.com/v2/stats/br/v2?name={account_name}&accountType={account_type}&image=all', headers=self.headers)
+        response = await self.api.send_request('GET', '/v2/aes', parameters = {'keyFormat': keyformat}, snapshot = f'cache/aes/{keyformat}.json', cache = cache)
 
+        if response.status != 200:
+            return False
+        else:
             return await response.json()
 
-    async def get_cc(self, code=None):
+    async def get_stats(self, account_name=None, account_type='epic', time_window='lifetime'):
+        return await get_stats_service().get(account_name, account_type, time_window)
 
-        async with self.ClientSession() as session:
+    async def get_cc(self, code=None):
 
-            response = await session.get(f'https://fortnite-api.com/v2/creatorcode/search?name={code}', headers=self.headers)
+        response = await self.api.send_request('GET', '/v2/creatorcode/search', parameters = {'name': code})
 
-            if response.status != 200:
-                return False
-            else:
-                return await response.json()
+        if response.status != 200:
+            return False
+        else:
+            return await response.json()
 
     async def get_playlists(self, language='en'):
 
-        async with self.ClientSession() as session:
-                
-            response = await session.get(f'https://fortnite-api.com/v1/playlists?language={language}', headers=self.headers)
+        response = await self.api.send_request('GET', '/v1/playlists', parameters = {'language': language})
 
-            if response.status != 200:
-                return False
-            else:
-                return await response.json()
+        if response.status != 200:
+            return False
+        else:
+            return await response.json()
 
 def get_custom_shop_url(server: dict):
 
@@ -638,6 +693,23 @@ class Colors:
     ORANGE = 0xDE6F00
     RED = 0xDE1E00
 
+async def get_shop_sections(lang: str):
+
+    catalog = shop_sections.get(lang, None)
+
+    if catalog == None:
+
+        try:
+            async with aiofiles.open(f'cache/shopsections/sections_{lang}.json', 'r', encoding='utf-8') as f:
+                catalog = SectionCatalog(lang, json.loads(await f.read()))
+        except FileNotFoundError:
+            log.warning(f'[{lang}] There are no cached shop sections yet.')
+            catalog = SectionCatalog(lang)
+
+        shop_sections[lang] = catalog
+
+    return catalog
+
 def get_section_displayname(section_id: str, sections_data: list):
     for section in sections_data:
         if section['sectionId'] == section_id:
@@ -1,8 +1,13 @@
+from collections.abc import Sequence
 import traceback
 import logging
 import discord
+import time
 import io
 
+from modules.catalog import is_cosmetic_id
+from modules.search import normalize
+from modules.cache import LRUCache
 from modules import util
 
 log = logging.getLogger('FortniteData.modules.components')
@@ -587,6 +592,35 @@ class LinkButton(discord.ui.View):
             )
         )
 
+class LazyPages(Sequence):
+
+    # pages for discord.ext.pages.Paginator, only the pages someone looks at are built
+    def __init__(self, results, render, cached: int = 3):
+
+        self.results = results
+        self.render = render # (index, item, total) -> page
+
+        self.rendered = LRUCache('pages', maxsize = cached)
+
+    def __len__(self):
+        return len(self.results)
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        page = self.rendered.get(index)
+
+        if page == None:
+            page = self.render(index, self.results[index], len(self.results))
+            self.rendered.set(index, page)
+
+        return page
+
 # Autocompletes
 
 async def autocomplete_search_language(ctx: discord.AutocompleteContext):
@@ -599,4 +633,70 @@ async def autocomplete_search_language(ctx: discord.AutocompleteContext):
         if ctx.value.lower() in i:
             results.append(i)
 
-    return results
\ No newline at end of file
+    return results
+
+autocomplete_cache = LRUCache('autocomplete', maxsize = 4096)
+autocomplete_budget = 0.25 # seconds, discord drops the response after 3
+
+def _autocomplete_lang(ctx: discord.AutocompleteContext):
+
+    language = ctx.options.get('language', 'none')
+
+    if language in util.fortniteapi:
+        return language
+
+    return util.get_lang(ctx)
+
+def _autocomplete(kind: str, catalog, value: str, by_id: bool = False):
+
+    if catalog == None or len(catalog) == 0:
+        return []
+
+    key = (kind, catalog.language, catalog.version, by_id, normalize(value))
+
+    results = autocomplete_cache.get(key)
+
+    if results != None:
+        return results
+
+    start = time.perf_counter()
+
+    handles = catalog.suggest(value, by_id = by_id, limit = 25, deadline = start + autocomplete_budget) # 25 is the discord limit
+
+    if by_id:
+        results = [catalog.record_id(handle)[:100] for handle in handles]
+    else:
+        results = [catalog.display_name(handle)[:100] for handle in handles if catalog.display_name(handle)]
+
+    elapsed = time.perf_counter() - start
+
+    if elapsed > autocomplete_budget:
+        log.warning(f'[{kind}] Autocomplete for "{value}" took {round(elapsed * 1000)}ms, over the {round(autocomplete_budget * 1000)}ms budget.')
+
+    autocomplete_cache.set(key, results)
+
+    return results
+
+async def autocomplete_cosmetics(ctx: discord.AutocompleteContext):
+
+    fortniteapi = util.fortniteapi.get(_autocomplete_lang(ctx), None)
+
+    if fortniteapi == None:
+        return []
+
+    return _autocomplete('cosmetics', fortniteapi.catalog, ctx.value, by_id = is_cosmetic_id(ctx.value))
+
+async def autocomplete_playlists(ctx: discord.AutocompleteContext):
+
+    fortniteapi = util.fortniteapi.get(_autocomplete_lang(ctx), None)
+
+    if fortniteapi == None:
+        return []
+
+    return _autocomplete('playlists', fortniteapi.playlists, ctx.value, by_id = normalize(ctx.value).startswith('playlist_'))
+
+async def autocomplete_sections(ctx: discord.AutocompleteContext):
+
+    catalog = await util.get_shop_sections(_autocomplete_lang(ctx))
+
+    return _autocomplete('sections', catalog, ctx.value)